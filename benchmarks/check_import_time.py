@@ -0,0 +1,69 @@
+"""
+Check that enabling the add-on stays cheap: importing and registering it must fit a time budget and must not
+import the builder or sync machinery, which is only loaded on first use.
+
+    blender -b --factory-startup --python benchmarks/check_import_time.py -- --budget-ms 50
+    python benchmarks/check_import_time.py  # with the `bpy` module installed
+
+Exits with status 1 when the budget is exceeded or a lazily loaded module was imported, so it can gate CI.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import bpy  # noqa: F401  # imported up front so its own import time isn't counted
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PACKAGE = "i3d_material_visualizer"
+LAZY_MODULES = (
+    "batch",
+    "builder",
+    "data_index",
+    "dds",
+    "dedup",
+    "graph_utils",
+    "library",
+    "masks",
+    "plan",
+    "prefetch",
+    "proxies",
+    "specialize",
+    "specs",
+    "sync",
+)
+
+
+def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="allowed import + register time")
+    args = parser.parse_args(argv)
+
+    if any(name == PACKAGE or name.startswith(f"{PACKAGE}.") for name in sys.modules):
+        print(f"{PACKAGE} is already imported, run this check in a fresh Blender")
+        return 1
+
+    start = time.perf_counter()
+    addon = __import__(PACKAGE)
+    addon.register()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    eager = [name for name in LAZY_MODULES if f"{PACKAGE}.{name}" in sys.modules]
+    addon.unregister()
+
+    print(f"import + register: {elapsed_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    failed = False
+    if elapsed_ms > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    if eager:
+        print(f"FAIL: imported at startup: {', '.join(eager)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
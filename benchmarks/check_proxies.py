@@ -0,0 +1,75 @@
+"""
+Check that texture proxies really save memory: after turning proxy mode on, every visualized diffuse texture must be
+shown through a proxy no larger than the proxy size, while the material's own Diffuse node, which the exporter
+reads, keeps the full resolution image.
+
+    blender -b --factory-startup --python benchmarks/check_proxies.py -- --texture-size 1024 --proxy-size 256
+    python benchmarks/check_proxies.py  # with the `bpy` module installed
+
+The I3D exporter add-on (i3dio) must be installed. Exits with status 1 on failure, so it can gate CI.
+"""
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import bpy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import synthetic  # noqa: E402
+from run_benchmarks import enable_i3dio  # noqa: E402
+
+import i3d_material_visualizer as visualizer  # noqa: E402
+from i3d_material_visualizer.constants import ROLE_PROP  # noqa: E402
+
+
+def _image_node(mat: bpy.types.Material, role: str) -> bpy.types.Node | None:
+    return next((n for n in mat.node_tree.nodes if n.get(ROLE_PROP) == role), None)
+
+
+def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--materials", type=int, default=4, help="number of vehicleShader materials")
+    parser.add_argument("--texture-size", type=int, default=1024, help="edge length of the stub DDS textures")
+    parser.add_argument("--proxy-size", choices=("256", "512"), default="256", help="proxy edge length")
+    parser.add_argument("--i3dio-module", help="module name of the I3D exporter add-on (auto-detected)")
+    args = parser.parse_args(argv)
+
+    fs_data_path = tempfile.mkdtemp(prefix="i3d_proxy_check_")
+    synthetic.create_fs_data_dir(Path(fs_data_path), args.materials, args.texture_size)
+    enable_i3dio(args.i3dio_module, fs_data_path)
+    visualizer.register()
+    mats = synthetic.build_scene(Path(fs_data_path), args.materials, objects=args.materials, uv_layers=3)
+    bpy.ops.i3d_material_visualizer.visualize_all(enable=True)
+
+    props = bpy.context.scene.i3d_material
+    props.proxy_size = args.proxy_size
+    props.use_texture_proxies = True  # rebuilds with the proxy nodes, then calls set_proxy_mode()
+
+    max_size = int(args.proxy_size)
+    failures = []
+    for mat in mats:
+        full, proxy = _image_node(mat, "Diffuse"), _image_node(mat, "Diffuse Proxy")
+        if full is None or full.image is None or proxy is None or proxy.image is None:
+            failures.append(f"{mat.name}: no Diffuse or Diffuse Proxy image")
+            continue
+        full_size, proxy_size = tuple(full.image.size), tuple(proxy.image.size)
+        print(f"{mat.name}: diffuse {full_size}, proxy {proxy_size}")
+        if max(full_size) != args.texture_size:
+            failures.append(f"{mat.name}: exported diffuse image is {full_size}, not full resolution")
+        if max(proxy_size) > max_size or max(proxy_size) >= max(full_size):
+            failures.append(f"{mat.name}: proxy image {proxy_size} is not smaller than {max_size} px")
+    visualizer.unregister()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Cycles CPU render benchmark of the generic vehicle shader against its specialized mask variants.
+
+    blender -b --factory-startup --python benchmarks/render_masks.py -- --materials 20 --samples 16 64 -o render.json
+
+For every mask combination given with --masks, renders the same visualized scene with the generic shader and with
+the specialized variant, at two sample counts. The time difference between the two counts, divided by the sample
+difference, is the time per sample without scene sync and shader compilation, which are reported separately.
+The I3D exporter add-on must be installed; a fake FS data directory is generated unless --fs-data-path is given.
+"""
+
+import argparse
+import json
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import bpy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import synthetic  # noqa: E402
+from run_benchmarks import enable_i3dio  # noqa: E402
+
+import i3d_material_visualizer as visualizer  # noqa: E402
+from i3d_material_visualizer import runtime  # noqa: E402
+from i3d_material_visualizer.batch import visualize_materials  # noqa: E402
+from i3d_material_visualizer.constants import VEHICLE_SHADER_GROUP_NAME  # noqa: E402
+from i3d_material_visualizer.library import get_shader_group  # noqa: E402
+from i3d_material_visualizer.masks import MASKS, mask_controller  # noqa: E402
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--materials", type=int, default=20, help="number of vehicleShader materials")
+    parser.add_argument("--objects", type=int, default=100, help="number of mesh objects, laid out on a grid")
+    parser.add_argument("--texture-size", type=int, default=64, help="edge length of the stub DDS textures")
+    parser.add_argument("--samples", type=int, nargs=2, default=(16, 64), help="low and high sample counts")
+    parser.add_argument("--resolution", type=int, default=256, help="edge length of the rendered image")
+    parser.add_argument("--threads", type=int, default=0, help="render threads (0 = all cores)")
+    parser.add_argument(
+        "--masks",
+        nargs="+",
+        default=["none", "all"],
+        help="mask combinations to compare: none, all, or comma-separated group input names, e.g. Dirt,Snow",
+    )
+    parser.add_argument("--fs-data-path", help="use an existing FS data directory instead of a generated one")
+    parser.add_argument("--i3dio-module", help="module name of the I3D exporter add-on (auto-detected)")
+    parser.add_argument("-o", "--output", help="JSON output file (stdout if omitted)")
+    return parser.parse_args(argv)
+
+
+def mask_states(spec: str) -> dict[str, bool]:
+    if spec == "all":
+        return dict.fromkeys(MASKS, True)
+    enabled = set() if spec == "none" else set(spec.split(","))
+    if unknown := enabled - MASKS.keys():
+        sys.exit(f"Unknown masks: {', '.join(sorted(unknown))}")
+    return {name: name in enabled for name in MASKS}
+
+
+def setup_render(scene: bpy.types.Scene, objects: list[bpy.types.Object], args: argparse.Namespace) -> None:
+    """Lay the objects out on a grid under an orthographic camera and a sun, and set up Cycles on the CPU."""
+    columns = math.ceil(math.sqrt(len(objects)))
+    for i, obj in enumerate(objects):
+        obj.location = (i % columns * 1.1, i // columns * 1.1, 0)
+    center = (columns * 1.1 / 2, columns * 1.1 / 2)
+
+    camera = bpy.data.objects.new("bench_camera", bpy.data.cameras.new("bench_camera"))
+    camera.data.type = "ORTHO"
+    camera.data.ortho_scale = columns * 1.1
+    camera.location = (*center, 10)
+    scene.collection.objects.link(camera)
+    scene.camera = camera
+    sun = bpy.data.objects.new("bench_sun", bpy.data.lights.new("bench_sun", "SUN"))
+    sun.rotation_euler = (0.6, 0.2, 0.0)
+    scene.collection.objects.link(sun)
+
+    render = scene.render
+    render.engine = "CYCLES"
+    render.resolution_x = render.resolution_y = args.resolution
+    render.resolution_percentage = 100
+    render.threads_mode = "FIXED" if args.threads else "AUTO"
+    if args.threads:
+        render.threads = args.threads
+    scene.cycles.device = "CPU"
+    scene.cycles.use_denoising = False
+    scene.cycles.use_adaptive_sampling = False
+    scene.cycles.time_limit = 0
+    render.filepath = str(Path(tempfile.gettempdir()) / "i3d_render_bench")
+
+
+def render_time(scene: bpy.types.Scene, samples: int) -> float:
+    scene.cycles.samples = samples
+    start = time.perf_counter()
+    bpy.ops.render.render(write_still=False)
+    return time.perf_counter() - start
+
+
+def measure_mode(scene: bpy.types.Scene, args: argparse.Namespace) -> dict:
+    low, high = sorted(args.samples)
+    render_time(scene, 1)  # warm up: load images and compile kernels outside the measurement
+    t_low, t_high = render_time(scene, low), render_time(scene, high)
+    per_sample = (t_high - t_low) / (high - low)
+    return {"per_sample": per_sample, "overhead": t_low - per_sample * low, "renders": {low: t_low, high: t_high}}
+
+
+def run(args: argparse.Namespace) -> dict:
+    fs_data_path = args.fs_data_path or tempfile.mkdtemp(prefix="i3d_bench_data_")
+    if not args.fs_data_path:
+        synthetic.create_fs_data_dir(Path(fs_data_path), args.materials, args.texture_size)
+    enable_i3dio(args.i3dio_module, fs_data_path)
+    visualizer.register()
+    runtime.load()
+
+    mats = synthetic.build_scene(Path(fs_data_path), args.materials, args.objects, uv_layers=3, inconsistent_ratio=0)
+    scene = bpy.context.scene
+    setup_render(scene, [obj for obj in scene.objects if obj.type == "MESH"], args)
+    visualize_materials(mats)
+
+    props = scene.i3d_material
+    results = {}
+    for spec in args.masks:
+        states = mask_states(spec)
+        for name, attr in MASKS.items():
+            setattr(props, attr, states[name])
+        modes = {}
+        for mode, specialized in (("generic", False), ("specialized", True)):
+            props.use_specialized_shaders = specialized
+            mask_controller.cancel()  # timers don't run in the background, apply right away
+            mask_controller.apply(props)
+            modes[mode] = measure_mode(scene, args)
+        group = mats[0].node_tree.nodes[VEHICLE_SHADER_GROUP_NAME].node_tree
+        results[spec] = {
+            **modes,
+            "speedup": modes["generic"]["per_sample"] / max(modes["specialized"]["per_sample"], 1e-9),
+            "variant_nodes": len(group.nodes),
+        }
+    return {
+        "blender": bpy.app.version_string,
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "generic_nodes": len(get_shader_group().nodes),
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
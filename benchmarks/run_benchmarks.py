@@ -0,0 +1,151 @@
+"""
+Headless benchmarks for the I3D Material Visualizer.
+
+    blender -b --factory-startup --python benchmarks/run_benchmarks.py -- --materials 200 --objects 2000 -o bench.json
+    python benchmarks/run_benchmarks.py --materials 200  # with the `bpy` module installed
+
+The I3D exporter add-on (i3dio) must be installed, as the visualizer works on its material attributes.
+Unless --fs-data-path is given, a fake FS data directory with stub DDS textures is generated.
+Results are written as JSON, so runs from different releases can be compared.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import addon_utils
+import bpy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import synthetic  # noqa: E402
+
+import i3d_material_visualizer as visualizer  # noqa: E402
+from i3d_material_visualizer import runtime  # noqa: E402
+from i3d_material_visualizer.builder import MaterialVisualizer  # noqa: E402
+from i3d_material_visualizer.masks import MASKS, mask_controller  # noqa: E402
+from i3d_material_visualizer.sync import SyncDirection, sync_params, sync_textures  # noqa: E402
+from i3d_material_visualizer.utils import invalidate_material_user_index  # noqa: E402
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--materials", type=int, default=100, help="number of vehicleShader materials")
+    parser.add_argument("--objects", type=int, default=1000, help="number of mesh objects")
+    parser.add_argument("--uv-layers", type=int, default=3, help="UV layers per mesh")
+    parser.add_argument("--texture-size", type=int, default=4, help="edge length of the stub DDS textures")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark")
+    parser.add_argument("--fs-data-path", help="use an existing FS data directory instead of a generated one")
+    parser.add_argument("--i3dio-module", help="module name of the I3D exporter add-on (auto-detected)")
+    parser.add_argument("-o", "--output", help="JSON output file (stdout if omitted)")
+    return parser.parse_args(argv)
+
+
+def enable_i3dio(module_name: str | None, fs_data_path: str) -> None:
+    if module_name is None:
+        module_name = next((m.__name__ for m in addon_utils.modules() if m.__name__.endswith("i3dio")), None)
+    if module_name is None:
+        sys.exit("I3D exporter add-on (i3dio) is not installed")
+    addon_utils.enable(module_name, default_set=True)
+    bpy.context.preferences.addons[module_name].preferences.fs_data_path = fs_data_path
+
+
+def measure(fn: Callable[[], object], repeat: int, setup: Callable[[], object] | None = None) -> dict:
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+
+
+def run(args: argparse.Namespace) -> dict:
+    fs_data_path = args.fs_data_path or tempfile.mkdtemp(prefix="i3d_bench_data_")
+    if not args.fs_data_path:
+        synthetic.create_fs_data_dir(Path(fs_data_path), args.materials, args.texture_size)
+    enable_i3dio(args.i3dio_module, fs_data_path)
+    visualizer.register()
+    runtime.load()  # register the cache handlers up front, as the first operator run would
+
+    mats = synthetic.build_scene(Path(fs_data_path), args.materials, args.objects, args.uv_layers)
+    scene = bpy.context.scene
+    uv_snapshot = {mesh: [layer.name for layer in mesh.uv_layers] for mesh in bpy.data.meshes}
+
+    def enable_all():
+        for mat in mats:
+            MaterialVisualizer.enable(mat)
+
+    def disable_all(purge: bool = False):
+        for mat in mats:
+            MaterialVisualizer.disable(mat, purge=purge)
+
+    def sync_all(fn, direction):
+        return lambda: [fn(mat, direction) for mat in mats]
+
+    def restore_uv_names():
+        for mesh, names in uv_snapshot.items():
+            for layer, name in zip(mesh.uv_layers, names):
+                layer.name = name
+        invalidate_material_user_index()
+
+    def toggle_masks():
+        props = scene.i3d_material
+        for attr in MASKS.values():
+            setattr(props, attr, not getattr(props, attr))
+        mask_controller.flush()
+
+    scene.i3d_material.src_material, scene.i3d_material.dst_material = mats[0], mats[-1]
+    benchmarks = {
+        "enable": (enable_all, lambda: disable_all(purge=True)),
+        "enable_from_parked": (enable_all, lambda: (enable_all(), disable_all())),
+        "enable_noop": (enable_all, enable_all),
+        "sync_params_props_to_nodes": (sync_all(sync_params, SyncDirection.PROPS_TO_NODES), None),
+        "sync_params_nodes_to_props": (sync_all(sync_params, SyncDirection.NODES_TO_PROPS), None),
+        "sync_textures_props_to_nodes": (sync_all(sync_textures, SyncDirection.PROPS_TO_NODES), None),
+        "sync_textures_nodes_to_props": (sync_all(sync_textures, SyncDirection.NODES_TO_PROPS), None),
+        "disable": (disable_all, enable_all),
+        "visualize_all_enable": (
+            lambda: bpy.ops.i3d_material_visualizer.visualize_all(enable=True),
+            lambda: bpy.ops.i3d_material_visualizer.visualize_all(enable=False),
+        ),
+        "visualize_all_disable": (
+            lambda: bpy.ops.i3d_material_visualizer.visualize_all(enable=False),
+            lambda: bpy.ops.i3d_material_visualizer.visualize_all(enable=True),
+        ),
+        "standardize_uvs": (
+            lambda: bpy.ops.i3d_material_visualizer.standardize_uvs(),
+            lambda: (bpy.ops.i3d_material_visualizer.visualize_all(enable=True), restore_uv_names()),
+        ),
+        "standardize_uvs_noop": (lambda: bpy.ops.i3d_material_visualizer.standardize_uvs(), None),
+        "copy_attributes": (lambda: bpy.ops.i3d_material_visualizer.copy_attributes("EXEC_DEFAULT"), None),
+        "mask_toggle": (toggle_masks, None),
+    }
+    results = {name: measure(fn, args.repeat, setup) for name, (fn, setup) in benchmarks.items()}
+    return {
+        "blender": bpy.app.version_string,
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
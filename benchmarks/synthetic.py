@@ -0,0 +1,115 @@
+"""Synthetic FS data directories and scenes for the benchmarks."""
+
+import random
+import struct
+from pathlib import Path
+
+import bpy
+
+SHARED_TEXTURES = ("white_diffuse.dds", "default_vmask.dds", "default_normal.dds")
+DDSD_FLAGS = 0x1 | 0x2 | 0x4 | 0x1000 | 0x20000 | 0x80000  # caps, height, width, pixelformat, mipmapcount, linearsize
+DDSCAPS_TEXTURE_MIPMAP = 0x1000 | 0x400000 | 0x8
+DDPF_FOURCC = 0x4
+
+
+def _dxt1_level_size(width: int, height: int) -> int:
+    return max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * 8
+
+
+def write_stub_dds(path: Path, size: int = 4) -> None:
+    """Write a valid, flat grey DXT1 texture with a full mip chain."""
+    levels = []
+    w = h = size
+    while True:
+        levels.append(_dxt1_level_size(w, h))
+        if w == 1 and h == 1:
+            break
+        w, h = max(1, w // 2), max(1, h // 2)
+    header = struct.pack("<7I", 124, DDSD_FLAGS, size, size, levels[0], 0, len(levels))
+    header += b"\0" * 44
+    header += struct.pack("<II4s5I", 32, DDPF_FOURCC, b"DXT1", 0, 0, 0, 0, 0)
+    header += struct.pack("<5I", DDSCAPS_TEXTURE_MIPMAP, 0, 0, 0, 0)
+    block = struct.pack("<HHI", 0x8410, 0x8410, 0)  # both endpoints mid grey, all indices 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"DDS " + header)
+        for level_size in levels:
+            f.write(block * (level_size // 8))
+
+
+def create_fs_data_dir(root: Path, materials: int, texture_size: int = 4) -> Path:
+    """Create a fake `$data` tree with the shared defaults and one texture set per material."""
+    for name in SHARED_TEXTURES:
+        write_stub_dds(root / "shared" / name, texture_size)
+    for i in range(materials):
+        for kind in ("diffuse", "specular", "normal"):
+            write_stub_dds(root / "vehicles" / "bench" / f"mat{i:04d}_{kind}.dds", texture_size)
+    write_stub_dds(root / "shared" / "detailLibrary" / "detail_diffuse.dds", texture_size)
+    return root
+
+
+def _new_mesh(name: str, uv_layers: int, inconsistent: bool) -> bpy.types.Mesh:
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)], [], [(0, 1, 2, 3)])
+    for k in range(uv_layers):
+        suffix = "_alt" if inconsistent and k > 0 else ""
+        mesh.uv_layers.new(name=f"UVMap{k}{suffix}")
+    return mesh
+
+
+def _new_material(name: str, index: int) -> bpy.types.Material:
+    """A vehicleShader material; every other one uses a detail diffuse map if the shader exposes that slot."""
+    mat = bpy.data.materials.new(name)
+    mat.use_nodes = True
+    attrs = mat.i3d_attributes
+    attrs.shader_name = "vehicleShader"
+    textures = attrs.shader_material_textures
+    if index % 2 == 0 and "detailDiffuse" in textures:
+        textures["detailDiffuse"].source = "$data/shared/detailLibrary/detail_diffuse.dds"
+    return mat
+
+
+def _assign_textures(mat: bpy.types.Material, fs_data_root: Path, index: int) -> None:
+    """Link the material's own diffuse and specular textures into its Principled BSDF, like an imported i3d."""
+    tree = mat.node_tree
+    principled = next((n for n in tree.nodes if n.bl_idname == "ShaderNodeBsdfPrincipled"), None)
+    if principled is None:
+        return
+    for socket, kind in (("Base Color", "diffuse"), ("Specular IOR Level", "specular")):
+        node = tree.nodes.new("ShaderNodeTexImage")
+        node.image = bpy.data.images.load(str(fs_data_root / "vehicles" / "bench" / f"mat{index:04d}_{kind}.dds"))
+        tree.links.new(node.outputs["Color"], principled.inputs[socket])
+
+
+def build_scene(
+    fs_data_root: Path,
+    materials: int,
+    objects: int,
+    uv_layers: int,
+    instance_ratio: float = 0.5,
+    inconsistent_ratio: float = 0.1,
+    seed: int = 0,
+) -> list[bpy.types.Material]:
+    """
+    Populate the current file with `materials` vehicleShader materials and `objects` mesh objects carrying
+    `uv_layers` UV layers each. `instance_ratio` of the objects share a mesh with an earlier object and
+    `inconsistent_ratio` of the meshes get non-standard UV names, so standardize_uvs has work to do.
+    """
+    rng = random.Random(seed)
+    scene = bpy.context.scene
+
+    mats = [_new_material(f"bench_mat_{i:04d}", i) for i in range(materials)]
+    for i, mat in enumerate(mats):
+        _assign_textures(mat, fs_data_root, i)
+
+    meshes: list[bpy.types.Mesh] = []
+    for i in range(objects):
+        if meshes and rng.random() < instance_ratio:
+            mesh = rng.choice(meshes)
+        else:
+            mesh = _new_mesh(f"bench_mesh_{i:05d}", uv_layers, rng.random() < inconsistent_ratio)
+            mesh.materials.append(mats[len(meshes) % materials] if mats else None)
+            meshes.append(mesh)
+        obj = bpy.data.objects.new(f"bench_obj_{i:05d}", mesh)
+        scene.collection.objects.link(obj)
+    return mats
@@ -1,17 +1,21 @@
 _needs_reload = "bpy" in locals()
 
+# Only the property, operator and panel definitions load at startup. The builder and sync machinery is
+# imported by runtime.load() the first time an operator runs or a material is visualized.
 from . import (
     ops,
     props,
+    runtime,
     ui,
 )
 
 if _needs_reload:
     import importlib
+    import sys
 
-    ops = importlib.reload(ops)
-    props = importlib.reload(props)
-    ui = importlib.reload(ui)
+    # Reload every submodule imported so far, the lazily imported ones included
+    for _name in sorted(name for name in sys.modules if name.startswith(f"{__name__}.")):
+        importlib.reload(sys.modules[_name])
 
 
 def register():
@@ -24,3 +28,4 @@ def unregister():
     ui.unregister()
     ops.unregister()
     props.unregister()
+    runtime.unregister()
@@ -0,0 +1,274 @@
+import fnmatch
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+import bpy
+
+from .builder import BuildSession, MaterialVisualizer, has_unbuilt_textures
+from .constants import FINGERPRINT_PROP, VEHICLE_SHADER_GROUP_NAME
+from .dedup import find_duplicate_groups
+from .graph_utils import clone_graph
+from .masks import mask_controller
+from .prefetch import collect_texture_paths, prefetch_textures
+from .props import suspended_visualize_updates
+from .proxies import proxy_settings
+from .report import Report, publish_profile
+from .sync import SyncDirection, load_custom_image, sync_params, sync_textures
+from .utils import MaterialUserIndex, get_material_user_index, is_vehicle_shader
+
+
+def visible_first(materials: Iterable[bpy.types.Material], index: MaterialUserIndex) -> list[bpy.types.Material]:
+    """Materials on objects visible in the view layer first, so what the artist looks at is built first. Stable."""
+    return sorted(materials, key=lambda mat: not any(obj.visible_get() for obj in index.users(mat)))
+
+
+def iter_visualize_materials(
+    materials: Iterable[bpy.types.Material],
+    enable: bool,
+    report: Report,
+    deduplicate: bool = False,
+    purge: bool = False,
+) -> Iterator[bpy.types.Material]:
+    """
+    Visualize or disable many materials, yielding each one once it is done, visible ones first.
+    The caller can stop between any two materials: each is flagged and built in one step, so a stopped run leaves
+    the materials it reached visualized and the others as they were.
+    """
+    with report.activate():
+        with report.phase("users index"):
+            index = get_material_user_index(bpy.context.scene)
+            materials = visible_first(materials, index)
+        session = BuildSession.create(report) if enable else None
+        if session and session.fs_data_path:
+            session.user_index = index
+        elif enable:
+            # Same as the update callback: nothing to build without a data path
+            with suspended_visualize_updates():
+                for mat in materials:
+                    mat.i3d_visualized = True
+            mask_controller.invalidate()
+            return
+
+        if enable:
+            with report.phase("prefetch"):
+                failed = prefetch_textures(materials, session.fs_data_path, proxy_settings())
+            if failed:
+                details = ", ".join(f"{probe.image_path} ({probe.error})" for probe in failed)
+                report.warn(f"{len(failed)} textures could not be loaded: {details}")
+
+        prototypes: dict[bpy.types.Material, bpy.types.Material] = {}  # duplicate -> built prototype
+        if enable and deduplicate:
+            with report.phase("deduplicate"):
+                for group in find_duplicate_groups(materials, index, match_tree=True):
+                    prototypes.update(dict.fromkeys(group.duplicates, group.prototype))
+
+    try:
+        for mat in materials:
+            with report.activate():
+                with suspended_visualize_updates():
+                    mat.i3d_visualized = enable
+                if (prototype := prototypes.get(mat)) and FINGERPRINT_PROP in prototype:
+                    # The prototype is already built and synced, and its params and textures are this material's
+                    with report.phase("clone"):
+                        if not mat.use_nodes:  # tree-less materials group together, the prototype got its tree built
+                            mat.use_nodes = True
+                        clone_graph(prototype, mat)
+                        MaterialVisualizer(mat, report.operator, session).stamp()
+                    report.count("materials cloned")
+                elif enable:
+                    with report.phase("build"):
+                        visualizer = MaterialVisualizer(mat, report.operator, session)
+                        visualizer.apply()
+                    report.merge(visualizer.reporter, mat.name)
+                    with report.phase("sync"):
+                        sync_params(mat, SyncDirection.PROPS_TO_NODES)
+                        sync_textures(mat, SyncDirection.PROPS_TO_NODES, visualizer.index)
+                else:
+                    with report.phase("disable"):
+                        MaterialVisualizer.disable(mat, purge)
+                report.count("materials")
+            yield mat
+    finally:
+        mask_controller.invalidate()
+        publish_profile(report, "Visualize All" if enable else "Disable All")
+
+
+def visualize_materials(
+    materials: Iterable[bpy.types.Material],
+    enable: bool = True,
+    operator: bpy.types.Operator | None = None,
+    deduplicate: bool = False,
+    purge: bool = False,
+) -> Report:
+    """
+    Visualize or disable many materials in one pass.
+    Addon prefs, the shader group and the material users index are resolved once and shared by every builder,
+    instead of once per material through the i3d_visualized update callback.
+    Bulk phase timings and counters are always collected; per-material phases only with the profile setting.
+    With deduplicate, materials with identical inputs and node trees are built once and the rest cloned from it.
+    Disabling parks the visualizer nodes, or removes them with purge.
+    """
+    report = Report(operator, profile=True)
+    for _mat in iter_visualize_materials(materials, enable, report, deduplicate, purge):
+        pass
+    return report
+
+
+def iter_rebuild_materials(materials: Iterable[bpy.types.Material], report: Report) -> Iterator[bpy.types.Material]:
+    """Rebuild visualized materials sharing one build session, visible ones first, yielding each one once done."""
+    with report.activate():
+        index = get_material_user_index(bpy.context.scene)
+        materials = visible_first(materials, index)
+        session = BuildSession.create(report) if materials else None
+        if session:
+            session.user_index = index
+    try:
+        for mat in materials:
+            with report.activate(), report.phase("build"):
+                MaterialVisualizer.enable(mat, session)
+            report.count("materials")
+            yield mat
+    finally:
+        publish_profile(report, "Rebuild")
+
+
+def materials_in_scope(
+    context: bpy.types.Context,
+    scope: str,
+    pattern: str = "",
+    collection: bpy.types.Collection | None = None,
+) -> list[bpy.types.Material]:
+    """
+    vehicleShader materials for a batch operation: those on the SELECTED objects, on the objects of a
+    COLLECTION, all VISUALIZED ones, or those whose name matches a PATTERN (fnmatch, case-insensitive).
+    """
+    if scope == "SELECTED":
+        candidates = {slot.material for obj in context.selected_objects for slot in obj.material_slots}
+    elif scope == "COLLECTION":
+        objects = collection.all_objects if collection else ()
+        candidates = {slot.material for obj in objects for slot in obj.material_slots}
+    elif scope == "VISUALIZED":
+        candidates = {mat for mat in bpy.data.materials if mat.users and mat.i3d_visualized}
+    else:
+        pattern = pattern.lower()
+        candidates = {mat for mat in bpy.data.materials if mat.users and fnmatch.fnmatchcase(mat.name.lower(), pattern)}
+    return sorted((mat for mat in candidates if mat and is_vehicle_shader(mat)), key=lambda mat: mat.name)
+
+
+def sync_materials(
+    materials: Iterable[bpy.types.Material],
+    direction: SyncDirection,
+    operator: bpy.types.Operator | None = None,
+    *,
+    skip_color_scale: bool = False,
+    only_color_scale: bool = False,
+) -> Report:
+    """
+    Sync params and textures of many materials in one pass, with one consolidated report.
+    Materials without a visualizer graph are built first when applying props to nodes, sharing one build session.
+    """
+    report = Report(operator, profile=True)
+    session = None
+
+    with report.activate():
+        for mat in materials:
+            if direction == SyncDirection.PROPS_TO_NODES and (
+                VEHICLE_SHADER_GROUP_NAME not in mat.node_tree.nodes or has_unbuilt_textures(mat)
+            ):
+                with report.phase("build"):
+                    session = session or BuildSession.create(report)
+                    MaterialVisualizer.enable(mat, session)
+            with report.phase("sync"):
+                params = sync_params(
+                    mat, direction, skip_color_scale=skip_color_scale, only_color_scale=only_color_scale
+                )
+                textures = set() if only_color_scale else sync_textures(mat, direction)
+            report.count("materials")
+            if params or textures:
+                report.count("materials changed")
+                report.count("params written", len(params))
+                report.count("textures written", len(textures))
+
+    publish_profile(report, "Sync Materials")
+    return report
+
+
+@dataclass
+class AttributePayload:
+    """A material's params and texture sources as plain values, compiled once to be copied many times."""
+
+    params: dict[str, list]
+    texture_sources: dict[str, str]
+
+    @classmethod
+    def compile(cls, material: bpy.types.Material) -> "AttributePayload":
+        attrs = material.i3d_attributes
+        params = {key: list(value) for key, value in attrs.shader_material_params.items()}
+        sources = {slot.name: slot.source for slot in attrs.shader_material_textures}
+        # Load the images the visualizer shows up front, so every destination hits the image cache. Missing
+        # files are reported by the cache rather than raised, so they don't stop the copy.
+        for path in sorted(collect_texture_paths([material])):
+            load_custom_image(path)
+        return cls(params, sources)
+
+    def apply(self, material: bpy.types.Material) -> tuple[bool, bool]:
+        """Write the payload into a material's attributes. Returns whether params and texture sources changed."""
+        attrs = material.i3d_attributes
+        dst_params = attrs.shader_material_params
+        params_changed = False
+        for key, value in self.params.items():
+            if key not in dst_params or list(dst_params[key]) != value:
+                dst_params[key] = value
+                params_changed = True
+        textures_changed = False
+        for slot in attrs.shader_material_textures:
+            source = self.texture_sources.get(slot.name)
+            if source is not None and slot.source != source:
+                slot.source = source
+                textures_changed = True
+        return params_changed, textures_changed
+
+
+def copy_attributes(
+    source: bpy.types.Material,
+    destinations: Iterable[bpy.types.Material],
+    operator: bpy.types.Operator | None = None,
+    *,
+    skip_color_scale: bool = False,
+    only_color_scale: bool = False,
+) -> Report:
+    """
+    Copy the params and texture sources of one material into many and sync them into their shader nodes.
+    Only destinations without a visualizer graph, or whose texture sources changed, are rebuilt.
+    """
+    report = Report(operator, profile=True)
+    session = None
+
+    with report.activate():
+        with report.phase("compile"):
+            payload = AttributePayload.compile(source)
+        for mat in destinations:
+            if mat == source:
+                continue
+            with report.phase("copy"):
+                params_changed, textures_changed = payload.apply(mat)
+            if textures_changed or VEHICLE_SHADER_GROUP_NAME not in mat.node_tree.nodes:
+                with report.phase("build"):
+                    session = session or BuildSession.create(report)
+                    MaterialVisualizer.enable(mat, session)
+                report.count("materials rebuilt")
+            with report.phase("sync"):
+                sync_params(
+                    mat,
+                    SyncDirection.PROPS_TO_NODES,
+                    skip_color_scale=skip_color_scale,
+                    only_color_scale=only_color_scale,
+                )
+                if not only_color_scale:
+                    sync_textures(mat, SyncDirection.PROPS_TO_NODES)
+            report.count("materials")
+            if params_changed or textures_changed:
+                report.count("materials changed")
+
+    publish_profile(report, "Copy Attributes")
+    return report
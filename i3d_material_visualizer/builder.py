@@ -1,52 +1,126 @@
-import bpy
-from bpy_extras.node_shader_utils import PrincipledBSDFWrapper, ShaderImageTextureWrapper
-
-from .graph_utils import apply_presentation, ensure_node, link_sockets, parse_link_path, remove_auto_nodes
-from .specs import SPECS, ImageSpec
-from .sync import get_fs_data_path_from_i3dio, load_custom_image, set_image
-from .utils import get_uv_names_by_index, import_shader
+import hashlib
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 
+import bpy
 
-def _adopt_or_create_image_node(texwrap: ShaderImageTextureWrapper) -> bpy.types.Node | None:
-    try:
-        return texwrap.node_image
-    except Exception:
+from .constants import FINGERPRINT_PROP, PARKED_PROP, VEHICLE_SHADER_GROUP_NAME
+from .graph_utils import (
+    TreeIndex,
+    apply_presentation,
+    ensure_node,
+    graph_fingerprint,
+    link_sockets,
+    park_auto_nodes,
+    remove_auto_node,
+    remove_auto_nodes,
+    tag_role,
+)
+from .masks import ensure_mask_control_group, shader_group_for
+from .plan import BUILD_PLAN, LAYOUT_COLLISION_STEP
+from .prefs import get_fs_data_path_from_i3dio
+from .proxies import proxy_image, proxy_settings
+from .report import Report, count, publish_profile
+from .specs import ImageSpec
+from .sync import load_custom_image, set_image
+from .utils import MaterialUserIndex, get_material_user_index, get_uv_names_by_index
+
+
+def ensure_principled_pair(index: TreeIndex) -> tuple[bpy.types.Node, bpy.types.Node]:
+    """
+    The material output and the Principled BSDF feeding it, found and created when missing the same way as
+    PrincipledBSDFWrapper(is_readonly=False): the first output fed by a BSDF, or the first BSDF feeding an output.
+    """
+    out = bsdf = None
+    for node in index.nodes:
+        if node.bl_idname == "ShaderNodeOutputMaterial" and (shader := index.linked_from(node, "Surface")):
+            out, bsdf = node, shader
+        elif node.bl_idname == "ShaderNodeBsdfPrincipled" and (links := index.links_from(node, "BSDF")):
+            bsdf = node
+            targets = [lnk.to_node for lnk in links]
+            out = next((n for n in targets if n.bl_idname == "ShaderNodeOutputMaterial"), targets[-1])
+        if (out and out.bl_idname == "ShaderNodeOutputMaterial") and (
+            bsdf and bsdf.bl_idname == "ShaderNodeBsdfPrincipled"
+        ):
+            break
+        out = bsdf = None
+
+    if out is None:
+        out = index.new("ShaderNodeOutputMaterial")
+        out.label = "Material Out"
+        out.target = "ALL"
+        out.location = (300, 0)
+    if bsdf is None:
+        bsdf = index.new("ShaderNodeBsdfPrincipled")
+        bsdf.label = "Principled BSDF"
+        index.link(bsdf.outputs["BSDF"], out.inputs["Surface"])
+    return out, bsdf
+
+
+def _adopt_or_create_node(
+    index: TreeIndex, to_node: bpy.types.Node, input_name: str, bl_idname: str, output: str, label: str = ""
+) -> bpy.types.Node | None:
+    """The node of the given type feeding an input, or a new one linked to it in place of whatever fed it."""
+    if (socket := to_node.inputs.get(input_name)) is None:
         return None
-
-
-def adopt_existing_nodes(mat: bpy.types.Material, wrapper: PrincipledBSDFWrapper) -> dict[str, bpy.types.Node]:
-    nodes = mat.node_tree.nodes
+    node = index.linked_from(to_node, input_name)
+    if node is None or node.bl_idname != bl_idname:
+        node = index.new(bl_idname)
+        node.label = label
+        node.location = (to_node.location.x - 300, to_node.location.y)
+        index.link(node.outputs[output], socket)
+    return node
+
+
+def adopt_existing_nodes(mat: bpy.types.Material, index: TreeIndex) -> dict[str, bpy.types.Node]:
+    """
+    Adopt the Principled BSDF's diffuse, normal and specular texture nodes, creating them where missing, with the
+    same results PrincipledBSDFWrapper gave but from one scan of the tree.
+    """
+    _, bsdf = ensure_principled_pair(index)
     adopted: dict[str, bpy.types.Node] = {}
 
-    if base_img_node := _adopt_or_create_image_node(wrapper.base_color_texture):
+    if base_img_node := _adopt_or_create_node(index, bsdf, "Base Color", "ShaderNodeTexImage", "Color"):
         adopted["Diffuse"] = base_img_node
-        base_img_node["i3d_role"] = "Diffuse"
-    if normalmap := wrapper.node_normalmap:
+        tag_role(base_img_node, "Diffuse")
+    if normalmap := _adopt_or_create_node(index, bsdf, "Normal", "ShaderNodeNormalMap", "Normal", "Normal/Map"):
         adopted["Normal Map"] = normalmap
-        normalmap["i3d_role"] = "Normal Map"
-    if normalmap_img_node := _adopt_or_create_image_node(wrapper.normalmap_texture):
-        adopted["Normal"] = normalmap_img_node
-        normalmap_img_node["i3d_role"] = "Normal"
-    if gloss := nodes.get("Glossmap"):
+        tag_role(normalmap, "Normal Map")
+        if normalmap_img_node := _adopt_or_create_node(index, normalmap, "Color", "ShaderNodeTexImage", "Color"):
+            adopted["Normal"] = normalmap_img_node
+            tag_role(normalmap_img_node, "Normal")
+    if gloss := index.get("Glossmap"):
         if gloss.bl_idname == "ShaderNodeSeparateColor":
             adopted["Glossmap"] = gloss
-            gloss["i3d_role"] = "Glossmap"
-            if (
-                gloss.inputs.get("Color").is_linked
-                and gloss.inputs["Color"].links[0].from_node.bl_idname == "ShaderNodeTexImage"
-            ):
-                spec_tex = gloss.inputs["Color"].links[0].from_node
+            tag_role(gloss, "Glossmap")
+            if (spec_tex := index.linked_from(gloss, "Color")) and spec_tex.bl_idname == "ShaderNodeTexImage":
                 adopted["Specular"] = spec_tex
-                spec_tex["i3d_role"] = "Specular"
+                tag_role(spec_tex, "Specular")
         elif gloss.bl_idname == "ShaderNodeTexImage":
             adopted["Specular"] = gloss
-            gloss["i3d_role"] = "Specular"
-    elif spec_tex_node := _adopt_or_create_image_node(wrapper.specular_texture):
+            tag_role(gloss, "Specular")
+    elif spec_tex_node := _adopt_or_create_node(index, bsdf, "Specular IOR Level", "ShaderNodeTexImage", "Color"):
         adopted["Specular"] = spec_tex_node
-        spec_tex_node["i3d_role"] = "Specular"
+        tag_role(spec_tex_node, "Specular")
     return adopted
 
 
+def available_textures(mat: bpy.types.Material) -> set[str]:
+    """Keys of the material's texture slots that have a source or a default source."""
+    return {slot.name for slot in mat.i3d_attributes.shader_material_textures if slot.source or slot.default_source}
+
+
+def has_unbuilt_textures(mat: bpy.types.Material) -> bool:
+    """Whether a texture slot has a source but no image node, e.g. a slot set since a minimal build left it out."""
+    nodes = mat.node_tree.nodes
+    available = available_textures(mat)
+    return any(
+        step.spec.image.key in available and nodes.get(step.role) is None
+        for step in BUILD_PLAN.nodes
+        if step.spec.image and step.spec.image.key
+    )
+
+
 def _assign_image(mat: bpy.types.Material, node: bpy.types.Node, image_spec: ImageSpec) -> None:
     if node.bl_idname != "ShaderNodeTexImage" or not image_spec:
         return
@@ -63,34 +137,78 @@ def _assign_image(mat: bpy.types.Material, node: bpy.types.Node, image_spec: Ima
         set_image(img, node, image_spec.colorspace)
 
 
-class Report:
-    def __init__(self, operator: bpy.types.Operator | None = None):
-        self.operator = operator
-        self.warnings: list[str] = []
-
-    def warn(self, msg: str) -> None:
-        self.warnings.append(msg)
-        if self.operator:
-            self.operator.report({"WARNING"}, msg)
-        else:
-            print(f"MaterialVisualizer: WARNING: {msg}")
+@dataclass
+class BuildSession:
+    """State resolved once and shared by every material built in the same operation."""
+
+    fs_data_path: str | None = None
+    user_index: MaterialUserIndex | None = None
+    global_masks: bool = False
+    minimal: bool = False
+    proxy_size: int | None = None  # texture proxy edge length, None for full resolution
+    profile: bool = False
+    groups: dict[str, bpy.types.NodeTree] = field(default_factory=dict)  # spec group name -> group to assign
+
+    @classmethod
+    def create(cls, report: Report | None = None) -> "BuildSession":
+        fs_data_path = get_fs_data_path_from_i3dio()
+        scene_props = bpy.context.scene.i3d_material
+        groups = {}
+        if fs_data_path:
+            with report.phase("shader import") if report else nullcontext():
+                # The specialized variant for the current mask toggles, if enabled, so builds assign it right away
+                if shader_group := shader_group_for(scene_props):
+                    groups[VEHICLE_SHADER_GROUP_NAME] = shader_group
+                if scene_props.use_global_masks:
+                    ensure_mask_control_group()
+        return cls(
+            fs_data_path=fs_data_path,
+            global_masks=scene_props.use_global_masks,
+            minimal=scene_props.minimal_graphs,
+            proxy_size=proxy_settings(),
+            profile=scene_props.profile,
+            groups=groups,
+        )
+
+    @property
+    def conditions(self) -> set[str]:
+        """Build conditions that don't depend on the material itself."""
+        flags = {
+            "global_masks": self.global_masks,
+            "minimal_graphs": self.minimal,
+            "texture_proxies": bool(self.proxy_size),
+            "full_resolution_textures": not self.proxy_size,
+        }
+        return {name for name, on in flags.items() if on}
+
+    @property
+    def users(self) -> MaterialUserIndex:
+        if self.user_index is None:
+            self.user_index = get_material_user_index()
+        return self.user_index
 
 
 class MaterialVisualizer:
-    def __init__(self, mat: bpy.types.Material, operator: bpy.types.Operator | None = None):
+    def __init__(
+        self,
+        mat: bpy.types.Material,
+        operator: bpy.types.Operator | None = None,
+        session: BuildSession | None = None,
+    ):
         self.mat = mat
         self.nodes: dict[str, bpy.types.Node] = {}
-        self.wrapper = PrincipledBSDFWrapper(mat, is_readonly=False)
-        self.reporter = Report(operator)
-
-    def _ensure_principled_bridge(self):
-        return bool(self.wrapper.node_out)
-
-    def _ensure_shader_group(self):
-        import_shader()
+        self.index: TreeIndex | None = None  # scanned by the build, and shared with the sync that follows it
+        self.standalone = session is None  # built on its own rather than as part of a bulk operation
+        if session is None:
+            self.reporter = Report(operator, profile=bpy.context.scene.i3d_material.profile)
+            session = BuildSession.create(self.reporter)
+        else:
+            self.reporter = Report(operator, profile=session.profile)
+        self.session = session
 
     def _configure_uv_nodes(self):
-        all_uv_names, user_objects = get_uv_names_by_index(self.mat)
+        index = self.session.users
+        all_uv_names, user_objects = get_uv_names_by_index(self.mat, index)
         if not user_objects:
             return
 
@@ -100,7 +218,7 @@ class MaterialVisualizer:
                 return
             names_found = all_uv_names.get(uv_index)
             for obj in user_objects:
-                if len(obj.data.uv_layers) <= uv_index:
+                if index.uv_name(obj.data, uv_index) is None:
                     self.reporter.warn(
                         f"{obj.name!r} is missing UV map at index {uv_index} required by material {self.mat.name!r}."
                     )
@@ -119,8 +237,9 @@ class MaterialVisualizer:
                 else:  # Success, found a single consistent name
                     chosen_name = names_found.pop()
 
-                if chosen_name:
+                if chosen_name and node.uv_map != chosen_name:
                     node.uv_map = chosen_name
+                    count("rna writes")
 
         requirements = self.mat.i3d_attributes.required_vertex_attributes
         if "uv1" in requirements:
@@ -129,78 +248,145 @@ class MaterialVisualizer:
             assign_uv_map_for_node(2, "uv_norm")
 
     def _position_nodes(self):
-        occupied_locations = set()
-        for role, spec in SPECS.items():
-            node_to_place = self.nodes.get(role)
-            if not node_to_place or not spec.location:
+        # Absolute locations taken so far: nodes placed relative to different anchors can still meet
+        occupied: set[tuple[int, int]] = set()
+        for step in BUILD_PLAN.nodes:
+            node_to_place = self.nodes.get(step.role)
+            if not node_to_place:
                 continue
-            final_location = (0, 0)
-            if spec.location_relative_to and (anchor := self.nodes.get(spec.location_relative_to)):
-                final_location = (anchor.location.x + spec.location[0], anchor.location.y + spec.location[1])
-            else:
-                final_location = spec.location
-
-            while final_location in occupied_locations:
-                final_location = (final_location[0], final_location[1] - 40)  # shift down to avoid overlap
-            node_to_place.location = final_location
-            occupied_locations.add(final_location)
-
-    def apply(self):
-        if not get_fs_data_path_from_i3dio():
-            return
-        self._ensure_shader_group()
-        if not self._ensure_principled_bridge():
-            return
-        adopted = adopt_existing_nodes(self.mat, self.wrapper)
-        # build nodes
-        for role, spec in SPECS.items():
-            if spec.only_if_adopted and role not in adopted:
-                continue
-            self.nodes[role] = adopted.get(role) or ensure_node(self.mat, spec)
-
-        self._position_nodes()
-
-        glossmap_is_present = self.nodes.get("Glossmap") is not None
-
-        for role, spec in SPECS.items():
-            this_node = self.nodes.get(role)
-            if not this_node:
+            if step.offset is None:  # placed by adoption or by the user, e.g. an anchor
+                occupied.add((round(node_to_place.location.x), round(node_to_place.location.y)))
                 continue
-
-            # Determine link directions and process conditions
-            all_links_with_direction = [(link, True) for link in spec.from_node] + [
-                (link, False) for link in spec.to_node
-            ]
-
-            for link, is_from_node_link in all_links_with_direction:
-                if link.condition == "glossmap_exists" and not glossmap_is_present:
+            x, y = step.offset
+            if step.anchor and (anchor := self.nodes.get(step.anchor)):
+                x, y = anchor.location.x + x, anchor.location.y + y
+            while (round(x), round(y)) in occupied:
+                y -= LAYOUT_COLLISION_STEP
+            occupied.add((round(x), round(y)))
+            if tuple(node_to_place.location) != (x, y):
+                node_to_place.location = (x, y)
+                count("rna writes")
+
+    def _fingerprint(self) -> str:
+        """Fingerprint of the current graph plus every input the build depends on."""
+        attrs = self.mat.i3d_attributes
+        requirements = attrs.required_vertex_attributes
+        textures = [(slot.name, slot.source, slot.default_source) for slot in attrs.shader_material_textures]
+        uv_names, _ = get_uv_names_by_index(self.mat, self.session.users)
+        inputs = (
+            BUILD_PLAN.fingerprint,
+            self.session.fs_data_path,
+            sorted(self.session.conditions),
+            sorted((name, group.name) for name, group in self.session.groups.items()),
+            self.session.proxy_size,
+            [f"uv{i}" in requirements for i in (1, 2)],
+            textures,
+            sorted((index, sorted(names)) for index, names in uv_names.items()),
+        )
+        return hashlib.sha1(repr((graph_fingerprint(self.mat), inputs)).encode()).hexdigest()
+
+    def apply(self, incremental: bool = True):
+        """
+        Build or update the visualizer graph. Every node, link, image and UV write is skipped when the graph
+        already holds the target value. In incremental mode, a material whose graph and inputs still match the
+        fingerprint stored by the last build is skipped entirely, so a no-op rebuild triggers no shader recompile.
+        """
+        if not self.session.fs_data_path:
+            return
+        with self.reporter.activate() if self.reporter.profile else nullcontext():
+            self._apply(incremental)
+        if self.standalone:
+            publish_profile(self.reporter, self.mat.name)
+
+    def _apply(self, incremental: bool) -> None:
+        reporter = self.reporter
+        if not self.mat.use_nodes:
+            self.mat.use_nodes = True  # creates the node tree of a material that has none
+        if incremental:
+            with reporter.phase("fingerprint"):
+                unchanged = self.mat.get(FINGERPRINT_PROP) == self._fingerprint()
+            if unchanged:
+                reporter.count("materials unchanged")
+                return
+        with reporter.phase("adoption"):
+            self.index = index = TreeIndex(self.mat.node_tree)
+            adopted = adopt_existing_nodes(self.mat, index)
+
+        conditions = self.session.conditions
+        # Minimal graphs leave out the nodes of unset optional textures, and remove them once a slot is cleared
+        unused = BUILD_PLAN.unused_roles(available_textures(self.mat)) if self.session.minimal else set()
+        with reporter.phase("node creation"):
+            for step in BUILD_PLAN.nodes:
+                if step.spec.only_if_adopted and step.role not in adopted:
                     continue
-                if link.condition == "glossmap_missing" and glossmap_is_present:
+                if (step.spec.condition and step.spec.condition not in conditions) or step.role in unused:
+                    remove_auto_node(self.mat, step.role, index)
                     continue
-
-                # Parse the link path and link sockets
-                if parts := parse_link_path(link.path):
-                    this_sock, other_node_role, other_sock = parts
-                    other_node = self.nodes.get(other_node_role)
-                    if other_node:
-                        link_sockets(this_node, other_node, this_sock, other_sock, from_node=is_from_node_link)
-
-        self._configure_uv_nodes()
-
-        for role, spec in SPECS.items():
-            if not (node := self.nodes.get(role)):
-                continue
-            _assign_image(self.mat, node, spec.image)
-            apply_presentation(node, spec)
+                node = adopted.get(step.role) or ensure_node(self.mat, step.spec, index, self.session.groups)
+                self.nodes[step.role] = node
+
+        with reporter.phase("positioning"):
+            self._position_nodes()
+
+        conditions.add("glossmap_exists" if self.nodes.get("Glossmap") is not None else "glossmap_missing")
+        with reporter.phase("linking"):
+            for link in BUILD_PLAN.links_for(conditions):
+                from_node = self.nodes.get(link.from_role)
+                to_node = self.nodes.get(link.to_role)
+                if from_node and to_node:
+                    link_sockets(to_node, from_node, link.to_socket, link.from_socket)
+
+        with reporter.phase("uv configuration"):
+            self._configure_uv_nodes()
+
+        with reporter.phase("image assignment"):
+            for step in BUILD_PLAN.nodes:
+                if node := self.nodes.get(step.role):
+                    _assign_image(self.mat, node, step.spec.image)
+            for step in BUILD_PLAN.nodes:
+                if step.spec.proxy_of and (node := self.nodes.get(step.role)):
+                    source = self.nodes.get(step.spec.proxy_of)
+                    if image := getattr(source, "image", None):
+                        image = proxy_image(image, self.session.proxy_size)
+                    set_image(image, node)
+
+        with reporter.phase("presentation"):
+            for step in BUILD_PLAN.nodes:
+                if node := self.nodes.get(step.role):
+                    apply_presentation(node, step.spec)
+
+        with reporter.phase("fingerprint"):
+            self.stamp()
+        reporter.count("materials built")
+
+    def stamp(self) -> None:
+        """Record the material's current graph as built: store its fingerprint and clear the parked flag."""
+        self.mat[FINGERPRINT_PROP] = self._fingerprint()
+        if PARKED_PROP in self.mat:
+            del self.mat[PARKED_PROP]
 
     @staticmethod
-    def enable(mat: bpy.types.Material) -> None:
-        MaterialVisualizer(mat).apply()
+    def enable(mat: bpy.types.Material, session: BuildSession | None = None, incremental: bool = True) -> None:
+        MaterialVisualizer(mat, session=session).apply(incremental)
 
     @staticmethod
-    def disable(mat: bpy.types.Material) -> None:
-        remove_auto_nodes(mat)
+    def disable(mat: bpy.types.Material, purge: bool = False) -> None:
+        """
+        Restore the material's own output. The visualizer nodes are parked: kept, images included, but cut off
+        from the original nodes, so enabling again only reconnects them. With purge they are removed instead.
+        """
+        if not mat.use_nodes:
+            mat.use_nodes = True
+        index = TreeIndex(mat.node_tree)
+        if purge:
+            remove_auto_nodes(mat, index)
+            for prop in (FINGERPRINT_PROP, PARKED_PROP):
+                if prop in mat:
+                    del mat[prop]
+        else:
+            park_auto_nodes(mat, index)
+            mat[PARKED_PROP] = True
         # Ensure the output and BSDF still exist and set active output
-        wrapper = PrincipledBSDFWrapper(mat, is_readonly=False)
-        if wrapper.node_out:
-            wrapper.node_out.is_active_output = True
+        out, _ = ensure_principled_pair(index)
+        if not out.is_active_output:
+            out.is_active_output = True
@@ -0,0 +1,208 @@
+"""
+Headless batch visualizer for .blend files.
+
+Process the open file inside Blender:
+
+    blender -b vehicle.blend --python i3d_material_visualizer/cli.py -- \\
+        --fs-data-path D:/FS25/data --standardize-uvs --sync PROPS_TO_NODES --save --report report.json
+
+Process many files in parallel, one background Blender per file:
+
+    python i3d_material_visualizer/cli.py --jobs 8 --blender blender --fs-data-path D:/FS25/data --save \\
+        --report reports.json vehicles/*.blend
+
+The I3D exporter add-on must be installed, as it defines the material attributes, but its preferences are not
+needed when --fs-data-path is given. Reports are JSON; the exit status is 1 if any file failed.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PACKAGE = "i3d_material_visualizer"
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help=".blend files to process in parallel (driver mode)")
+    parser.add_argument("--fs-data-path", help="FS data directory, instead of the exporter preference")
+    parser.add_argument("--disable", action="store_true", help="disable visualization instead of enabling it")
+    parser.add_argument("--purge", action="store_true", help="with --disable, remove the visualizer nodes")
+    parser.add_argument("--standardize-uvs", action="store_true", help="standardize UV map names first")
+    parser.add_argument("--sync", choices=("PROPS_TO_NODES", "NODES_TO_PROPS"), help="sync params and textures")
+    parser.add_argument("--deduplicate", action="store_true", help="clone identical materials instead of building")
+    parser.add_argument("--save", action="store_true", help="save the file after processing")
+    parser.add_argument("--report", help="write the JSON report here (stdout if omitted)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="parallel Blender processes")
+    parser.add_argument("--blender", default="blender", help="Blender executable for driver mode")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per file in driver mode")
+    return parser.parse_args(argv)
+
+
+# --------------------------------------------------------------------------------------
+# Inside Blender: process the open file
+# --------------------------------------------------------------------------------------
+
+
+def _import_addon():
+    """The add-on package: the enabled one if any, else this checkout, registered for the run."""
+    import bpy
+
+    for addon in bpy.context.preferences.addons:
+        if addon.module.rpartition(".")[2] == PACKAGE:
+            return importlib.import_module(addon.module)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    package = importlib.import_module(PACKAGE)
+    package.register()
+    return package
+
+
+def _enable_i3dio() -> None:
+    import addon_utils
+    import bpy
+
+    if any(addon.module.endswith("i3dio") for addon in bpy.context.preferences.addons):
+        return
+    module = next((m.__name__ for m in addon_utils.modules() if m.__name__.endswith("i3dio")), None)
+    if module is None:
+        raise RuntimeError("I3D exporter add-on (i3dio) is not installed")
+    addon_utils.enable(module, default_set=False)
+
+
+def process_open_file(args: argparse.Namespace) -> dict:
+    import bpy
+
+    _enable_i3dio()
+    package = _import_addon()
+    batch, prefs, runtime, utils = (
+        importlib.import_module(f"{package.__name__}.{name}") for name in ("batch", "prefs", "runtime", "utils")
+    )
+    runtime.load()
+    prefs.set_fs_data_path_override(args.fs_data_path)
+    if not prefs.get_fs_data_path_from_i3dio():
+        raise RuntimeError("no FS data path: pass --fs-data-path or set it in the exporter preferences")
+
+    scene = bpy.context.scene
+    materials = [mat for mat in bpy.data.materials if mat.users > 0 and utils.is_vehicle_shader(mat)]
+    result = {"file": bpy.data.filepath, "materials": len(materials), "steps": {}, "timings": {}}
+
+    def step(name: str, fn):
+        start = time.perf_counter()
+        outcome = fn()
+        result["timings"][name] = time.perf_counter() - start
+        result["steps"][name] = outcome.as_dict() if hasattr(outcome, "as_dict") else outcome
+
+    if args.standardize_uvs:
+
+        def standardize():
+            renames, conflicts = utils.plan_uv_standardization(materials, utils.get_material_user_index(scene))
+            utils.apply_uv_renames(renames)
+            return {"renamed": len(renames), "conflicts": len(conflicts)}
+
+        step("standardize_uvs", standardize)
+    step(
+        "disable" if args.disable else "visualize",
+        lambda: batch.visualize_materials(materials, not args.disable, deduplicate=args.deduplicate, purge=args.purge),
+    )
+    if args.sync and not args.disable:
+        step("sync", lambda: batch.sync_materials(materials, args.sync))
+    if args.save:
+
+        def save():
+            bpy.ops.wm.save_mainfile()
+
+        step("save", save)
+    return result
+
+
+def run_in_blender(args: argparse.Namespace) -> int:
+    try:
+        result = process_open_file(args)
+        status = 0
+    except Exception as e:
+        import bpy
+
+        result = {"file": bpy.data.filepath, "error": str(e), "traceback": traceback.format_exc()}
+        status = 1
+    write_report(result, args.report)
+    return status
+
+
+# --------------------------------------------------------------------------------------
+# Driver: one background Blender per file
+# --------------------------------------------------------------------------------------
+
+
+def forwarded_args(args: argparse.Namespace) -> list[str]:
+    forwarded = ["--fs-data-path", args.fs_data_path] if args.fs_data_path else []
+    for flag in ("disable", "purge", "standardize_uvs", "deduplicate", "save"):
+        if getattr(args, flag):
+            forwarded.append(f"--{flag.replace('_', '-')}")
+    if args.sync:
+        forwarded += ["--sync", args.sync]
+    return forwarded
+
+
+def run_file(blend_file: str, args: argparse.Namespace, report: Path) -> dict:
+    command = [
+        args.blender, "-b", blend_file, "--python", str(Path(__file__).resolve()), "--",
+        *forwarded_args(args), "--report", str(report),
+    ]  # fmt: skip
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(command, capture_output=True, text=True, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        return {"file": blend_file, "error": f"timed out after {args.timeout}s"}
+    try:
+        result = json.loads(report.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        result = {"file": blend_file, "error": f"Blender exited with {proc.returncode}", "output": proc.stderr[-4000:]}
+    result["wall_time"] = time.perf_counter() - start
+    return result
+
+
+def run_driver(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory(prefix="i3d_cli_") as report_dir:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:  # each worker waits on its own Blender
+            reports = [Path(report_dir) / f"{i:05d}.json" for i in range(len(args.files))]
+            results = list(pool.map(lambda path, report: run_file(path, args, report), args.files, reports))
+    failed = [result["file"] for result in results if "error" in result]
+    write_report({"files": results, "failed": failed}, args.report)
+    return 1 if failed else 0
+
+
+def write_report(report: dict, path: str | None) -> None:
+    text = json.dumps(report, indent=2, default=str)
+    if path:
+        Path(path).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        if "--" in sys.argv:
+            argv = sys.argv[sys.argv.index("--") + 1 :]
+        else:  # inside Blender, sys.argv holds Blender's own arguments, ours only follow "--"
+            argv = [] if "bpy" in sys.modules else sys.argv[1:]
+    args = parse_args(argv)
+    if args.files:
+        return run_driver(args)
+    try:
+        import bpy  # noqa: F401
+    except ImportError:
+        print("No .blend files given and not running inside Blender, nothing to do.", file=sys.stderr)
+        return 2
+    return run_in_blender(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
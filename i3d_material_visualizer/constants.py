@@ -2,3 +2,9 @@ ROLE_PROP = "i3d_role"
 I3DIO_ADDON_ID = ".i3dio"
 VEHICLE_SHADER_GROUP_NAME = "FS25_VehicleShader"
 AUTO_FLAG = "i3d_auto_created"
+FINGERPRINT_PROP = "i3d_visualizer_fingerprint"
+PARKED_PROP = "i3d_visualizer_parked"
+MASK_CONTROL_GROUP_NAME = "FS25_VisualizerMaskControls"
+SHADER_HASH_PROP = "i3d_visualizer_library_hash"
+PROXY_SOURCE_PROP = "i3d_proxy_source"
+VARIANT_PROP = "i3d_visualizer_variant"
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+
+import bpy
+
+INDEX_VERSION = 1
+
+
+@dataclass(frozen=True)
+class IndexedFile:
+    filepath: str  # absolute path with the on-disk spelling
+    size: int
+    mtime: float
+
+
+@dataclass
+class DirectoryListing:
+    path: str  # posix path relative to the data root, with the on-disk spelling
+    mtime: float
+    subdirs: dict[str, str] = field(default_factory=dict)  # lowercased name -> name
+    files: dict[str, tuple[str, int, float]] = field(default_factory=dict)  # lowercased name -> (name, size, mtime)
+    stems: dict[str, list[str]] = field(init=False, default_factory=dict)  # lowercased stem -> lowercased names
+
+    def __post_init__(self):
+        for name in self.files:
+            self.stems.setdefault(PurePosixPath(name).stem, []).append(name)
+
+
+class DataIndex:
+    """
+    Case-insensitive index of the FS `$data` tree, persisted between sessions.
+    Directories are listed on first use and rescanned only when their mtime changed, which is checked once
+    per directory until the next revalidate(), i.e. per file load and bulk run. A lookup in an unchanged
+    directory therefore costs at most one stat.
+    """
+
+    def __init__(self, root: str, cache_file: Path | None = None):
+        self.root = Path(root)
+        self.cache_file = cache_file
+        self.dirs: dict[str, DirectoryListing] = {}  # lowercased relative path -> listing
+        self._validated: set[str] = set()
+        self._dirty = False
+        self._lock = threading.RLock()  # lookups run on the prefetch worker threads too
+
+    def revalidate(self) -> None:
+        """Check every directory against the disk again on its next lookup, e.g. for files deleted since."""
+        with self._lock:
+            self._validated.clear()
+
+    def load(self) -> None:
+        if not self.cache_file or not self.cache_file.is_file():
+            return
+        try:
+            data = json.loads(self.cache_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION or data.get("root") != str(self.root):
+            return
+        self.dirs = {
+            key: DirectoryListing(path, mtime, subdirs, {name: tuple(info) for name, info in files.items()})
+            for key, (path, mtime, subdirs, files) in data["dirs"].items()
+        }
+
+    def save(self) -> None:
+        with self._lock:
+            if not (self.cache_file and self._dirty):
+                return
+            data = {
+                "version": INDEX_VERSION,
+                "root": str(self.root),
+                "dirs": {key: (d.path, d.mtime, d.subdirs, d.files) for key, d in self.dirs.items()},
+            }
+            self._dirty = False
+        try:
+            tmp = self.cache_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+            tmp.replace(self.cache_file)
+        except OSError as e:
+            print(f"I3D_Material_Visualizer: Could not save data index {self.cache_file}: {e}")
+
+    def _scan(self, path: str) -> DirectoryListing | None:
+        subdirs, files = {}, {}
+        try:
+            mtime = os.stat(self.root / path).st_mtime
+            with os.scandir(self.root / path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirs[entry.name.lower()] = entry.name
+                    elif entry.is_file():
+                        st = entry.stat()
+                        files[entry.name.lower()] = (entry.name, st.st_size, st.st_mtime)
+        except OSError:
+            return None
+        return DirectoryListing(path, mtime, subdirs, files)
+
+    def _listing(self, key: str) -> DirectoryListing | None:
+        """The up-to-date listing of a directory, by lowercased relative path."""
+        if key in self._validated:
+            return self.dirs.get(key)
+        listing = self.dirs.get(key)
+        if listing is not None:
+            try:
+                changed = os.stat(self.root / listing.path).st_mtime != listing.mtime
+            except OSError:
+                listing, changed = None, False
+            if changed:
+                listing = self._scan(listing.path)
+        else:
+            parent_key, _, name = key.rpartition("/")
+            if not key:
+                listing = self._scan("")
+            elif (parent := self._listing(parent_key)) and name in parent.subdirs:
+                listing = self._scan(str(PurePosixPath(parent.path, parent.subdirs[name])))
+        if listing is None:
+            self.dirs.pop(key, None)
+        elif self.dirs.get(key) is not listing:
+            self.dirs[key] = listing
+            self._dirty = True
+        self._validated.add(key)
+        return listing
+
+    def _find(self, relative_path: str, fallback_suffixes: tuple[str, ...]) -> tuple[DirectoryListing, str] | None:
+        parts = PurePosixPath(relative_path.replace("\\", "/").lower().strip("/")).parts
+        if not parts:
+            return None
+        with self._lock:
+            listing = self._listing("/".join(parts[:-1]))
+        if listing is None:
+            return None
+        name = PurePosixPath(parts[-1])
+        if name.name in listing.files:
+            return listing, name.name
+        siblings = listing.stems.get(name.stem, ())
+        for suffix in fallback_suffixes:
+            if (other := name.stem + suffix) in siblings:
+                return listing, other
+        return None
+
+    def lookup(self, relative_path: str, fallback_suffixes: tuple[str, ...] = ()) -> IndexedFile | None:
+        """
+        Find a file by its path relative to the data root, ignoring case. If it doesn't exist, the same file name
+        with one of fallback_suffixes is looked up instead, in order, e.g. the .dds of a .png.
+        """
+        if (found := self._find(relative_path, fallback_suffixes)) is None:
+            return None
+        listing, key = found
+        name, size, mtime = listing.files[key]
+        return IndexedFile(str(self.root / listing.path / name), size, mtime)
+
+    def asset_key(self, relative_path: str, fallback_suffixes: tuple[str, ...] = ()) -> str | None:
+        """A case-insensitive key of the directory and stem of an existing file, shared by its format variants."""
+        if (found := self._find(relative_path, fallback_suffixes)) is None:
+            return None
+        listing, key = found
+        return f"{listing.path.lower()}/{PurePosixPath(key).stem}"
+
+
+_indices: dict[str, DataIndex] = {}
+_indices_lock = threading.Lock()
+
+
+def _cache_file(root: str) -> Path | None:
+    try:
+        cache_dir = Path(bpy.utils.extension_path_user(__package__, path="data_index", create=True))
+    except ValueError:  # installed as a legacy add-on, which has no user directory
+        return None
+    return cache_dir / f"{hashlib.sha1(root.encode()).hexdigest()[:16]}.json"
+
+
+def get_data_index(fs_data_path: str) -> DataIndex:
+    """The index of an FS data directory, loaded from the user cache on first use in the session."""
+    root = str(Path(fs_data_path))
+    with _indices_lock:
+        if (index := _indices.get(root)) is None:
+            index = _indices[root] = DataIndex(root, _cache_file(root))
+            index.load()
+    return index
+
+
+def save_data_indices() -> None:
+    for index in list(_indices.values()):
+        index.save()
+
+
+def revalidate_data_indices() -> None:
+    for index in list(_indices.values()):
+        index.revalidate()
+
+
+def clear_data_indices() -> None:
+    """Forget the in-memory indices; the next lookup revalidates every directory against the disk."""
+    save_data_indices()
+    _indices.clear()
+
+
+@bpy.app.handlers.persistent
+def _save_on_file_save(*_args) -> None:
+    save_data_indices()
+
+
+@bpy.app.handlers.persistent
+def _revalidate_on_load(*_args) -> None:
+    revalidate_data_indices()
+
+
+_HANDLERS = (
+    (bpy.app.handlers.save_post, _save_on_file_save),
+    (bpy.app.handlers.load_post, _revalidate_on_load),
+)
+
+
+def register():
+    for handlers, handler in _HANDLERS:
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister():
+    for handlers, handler in _HANDLERS:
+        if handler in handlers:
+            handlers.remove(handler)
+    clear_data_indices()
@@ -0,0 +1,141 @@
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+DDS_MAGIC = b"DDS "
+HEADER_SIZE = 124
+DX10_HEADER_SIZE = 20
+PIXEL_FORMAT_SIZE = 32
+
+DDSD_PITCH = 0x8
+DDSD_LINEARSIZE = 0x80000
+DDSD_DEPTH = 0x800000
+DDSCAPS2_CUBEMAP = 0x200
+
+# Bytes per 4x4 block of the block-compressed formats
+FOURCC_BLOCK_SIZES = {
+    **dict.fromkeys((b"DXT1", b"ATI1", b"BC4U", b"BC4S"), 8),
+    **dict.fromkeys((b"DXT2", b"DXT3", b"DXT4", b"DXT5", b"ATI2", b"BC5U", b"BC5S"), 16),
+}
+DXGI_BLOCK_SIZES = {
+    **dict.fromkeys((*range(70, 73), *range(79, 82)), 8),  # BC1, BC4
+    **dict.fromkeys((*range(73, 79), *range(82, 85), *range(94, 100)), 16),  # BC2, BC3, BC5, BC6H, BC7
+}
+# Bytes per pixel of the common uncompressed DXGI formats
+DXGI_PIXEL_SIZES = {
+    **dict.fromkeys(range(2, 5), 16),  # R32G32B32A32
+    **dict.fromkeys(range(10, 15), 8),  # R16G16B16A16
+    **dict.fromkeys((*range(27, 33), 87, 88, *range(90, 94)), 4),  # R8G8B8A8, B8G8R8A8
+    **dict.fromkeys(range(49, 53), 2),  # R8G8
+    **dict.fromkeys(range(61, 66), 1),  # R8
+}
+
+
+@dataclass(frozen=True)
+class DDSHeader:
+    flags: int
+    height: int
+    width: int
+    pitch_or_linear_size: int
+    depth: int
+    mip_count: int
+    pf_flags: int
+    four_cc: bytes
+    caps2: int
+    dxgi_format: int | None = None  # only set for DX10 extended headers
+    rgb_bit_count: int = 0  # uncompressed formats only
+
+    @property
+    def data_offset(self) -> int:
+        return 4 + HEADER_SIZE + (DX10_HEADER_SIZE if self.dxgi_format is not None else 0)
+
+
+def read_header(stream: BinaryIO) -> DDSHeader:
+    """Read and validate a DDS header, raising ValueError for anything that isn't a well-formed DDS file."""
+    data = stream.read(4 + HEADER_SIZE)
+    if len(data) < 4 + HEADER_SIZE:
+        raise ValueError("truncated header")
+    if data[:4] != DDS_MAGIC:
+        raise ValueError("not a DDS file")
+    size, flags, height, width, pitch, depth, mip_count = struct.unpack_from("<7I", data, 4)
+    pf_size, pf_flags, four_cc, rgb_bit_count = struct.unpack_from("<II4sI", data, 76)
+    caps2 = struct.unpack_from("<I", data, 112)[0]
+    if size != HEADER_SIZE or pf_size != PIXEL_FORMAT_SIZE:
+        raise ValueError("invalid header size")
+    if width == 0 or height == 0:
+        raise ValueError("invalid dimensions")
+
+    dxgi_format = None
+    if four_cc == b"DX10":
+        dx10 = stream.read(DX10_HEADER_SIZE)
+        if len(dx10) < DX10_HEADER_SIZE:
+            raise ValueError("truncated DX10 header")
+        dxgi_format = struct.unpack_from("<I", dx10)[0]
+    return DDSHeader(
+        flags, height, width, pitch, depth, mip_count, pf_flags, four_cc, caps2, dxgi_format, rgb_bit_count
+    )
+
+
+def level_size(header: DDSHeader, width: int, height: int) -> int | None:
+    """Byte size of one mip level, or None for formats whose layout isn't known here."""
+    if header.dxgi_format is not None:
+        block = DXGI_BLOCK_SIZES.get(header.dxgi_format)
+        pixel = DXGI_PIXEL_SIZES.get(header.dxgi_format)
+    else:
+        block = FOURCC_BLOCK_SIZES.get(header.four_cc)
+        pixel = header.rgb_bit_count // 8 if not header.four_cc.strip(b"\0") else None
+    if block:
+        return max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * block
+    if pixel:
+        return width * height * pixel
+    return None
+
+
+def write_mip_tail(src_path: str | Path, dst_path: str | Path, max_size: int) -> bool:
+    """
+    Write a copy of a DDS texture that starts at its first mip level no larger than max_size, by copying
+    the existing lower levels without decoding them. Returns False, writing nothing, if the texture is
+    already small enough, has too few mip levels, or is a cubemap, volume or unknown format.
+    """
+    with open(src_path, "rb") as src:
+        header = read_header(src)
+        if header.caps2 & DDSCAPS2_CUBEMAP or (header.flags & DDSD_DEPTH and header.depth > 1):
+            return False
+        sizes, dims = [], []
+        width, height = header.width, header.height
+        for _ in range(max(1, header.mip_count)):
+            if (size := level_size(header, width, height)) is None:
+                return False
+            sizes.append(size)
+            dims.append((width, height))
+            width, height = max(1, width // 2), max(1, height // 2)
+        skip = next((i for i, (w, h) in enumerate(dims) if max(w, h) <= max_size), None)
+        if not skip:  # None: even the smallest level is too large; 0: nothing to drop
+            return False
+
+        src.seek(0)
+        prefix = bytearray(src.read(header.data_offset))
+        src.seek(sum(sizes[:skip]), os.SEEK_CUR)
+        tail = src.read(sum(sizes[skip:]))
+    if len(tail) < sum(sizes[skip:]):
+        raise ValueError("truncated mip chain")
+
+    width, height = dims[skip]
+    if header.flags & DDSD_LINEARSIZE:
+        pitch = sizes[skip]
+    elif header.flags & DDSD_PITCH:
+        pitch = sizes[skip] // max(1, height)
+    else:
+        pitch = header.pitch_or_linear_size
+    struct.pack_into("<3I", prefix, 12, height, width, pitch)
+    struct.pack_into("<I", prefix, 28, len(sizes) - skip)
+
+    dst_path = Path(dst_path)
+    tmp = dst_path.with_suffix(".tmp")
+    with open(tmp, "wb") as dst:
+        dst.write(prefix)
+        dst.write(tail)
+    tmp.replace(dst_path)
+    return True
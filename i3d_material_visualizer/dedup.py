@@ -0,0 +1,123 @@
+import hashlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import bpy
+
+from .constants import AUTO_FLAG
+from .utils import MaterialUserIndex, get_uv_names_by_index
+
+
+def _plain(value: object) -> object:
+    """IDProperty arrays and groups as plain Python values, so equal params hash equally."""
+    if hasattr(value, "to_list"):
+        return value.to_list()
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return value
+
+
+def material_signature(mat: bpy.types.Material, index: MaterialUserIndex) -> str:
+    """Content hash of everything the visualizer reads from a material: params, textures, vertex attributes, UVs."""
+    attrs = mat.i3d_attributes
+    uv_names, _ = get_uv_names_by_index(mat, index)
+    content = (
+        attrs.shader_name,
+        sorted((key, _plain(value)) for key, value in attrs.shader_material_params.items()),
+        [(slot.name, slot.source, slot.default_source) for slot in attrs.shader_material_textures],
+        sorted(attrs.required_vertex_attributes),
+        sorted((i, sorted(names)) for i, names in uv_names.items()),
+    )
+    return hashlib.sha1(repr(content).encode()).hexdigest()
+
+
+def _property_values(struct: bpy.types.bpy_struct) -> dict[str, object]:
+    """Every RNA and ID property of a property group as plain values, nested groups and collections included."""
+    values: dict[str, object] = {}
+    for prop in struct.bl_rna.properties:
+        key = prop.identifier
+        if key == "rna_type":
+            continue
+        value = getattr(struct, key)
+        if prop.type == "POINTER":
+            if isinstance(value, bpy.types.ID):
+                value = value.name_full
+            elif value is not None:
+                value = _property_values(value)
+        elif prop.type == "COLLECTION":
+            value = [_property_values(item) for item in value]
+        elif isinstance(value, set):  # enum flags
+            value = sorted(value)
+        elif getattr(prop, "is_array", False):
+            value = tuple(value)
+        values[key] = value
+    if hasattr(struct, "items"):  # ID properties set at runtime, e.g. the shader params
+        for key, value in struct.items():
+            values.setdefault(key, _plain(value))
+    return values
+
+
+def attributes_signature(mat: bpy.types.Material) -> str:
+    """Hash of the material's whole i3d_attributes property group, i.e. everything the exporter writes."""
+    return hashlib.sha1(repr(_property_values(mat.i3d_attributes)).encode()).hexdigest()
+
+
+def tree_signature(mat: bpy.types.Material) -> str:
+    """Hash of the nodes and links the visualizer didn't create, i.e. what a build adopts and builds on."""
+    nt = mat.node_tree
+    if nt is None:
+        return ""
+    nodes = sorted(
+        (n.name, n.bl_idname, (image.filepath if (image := getattr(n, "image", None)) else ""))
+        for n in nt.nodes
+        if not n.get(AUTO_FLAG)
+    )
+    links = sorted(
+        (lnk.from_node.name, lnk.from_socket.identifier, lnk.to_node.name, lnk.to_socket.identifier)
+        for lnk in nt.links
+        if not (lnk.from_node.get(AUTO_FLAG) or lnk.to_node.get(AUTO_FLAG))
+    )
+    return hashlib.sha1(repr((nodes, links)).encode()).hexdigest()
+
+
+@dataclass
+class DuplicateGroup:
+    """Materials with identical visualizer inputs. The prototype is the first in the order they were given."""
+
+    prototype: bpy.types.Material
+    duplicates: list[bpy.types.Material] = field(default_factory=list)
+
+
+def find_duplicate_groups(
+    materials: list[bpy.types.Material],
+    index: MaterialUserIndex,
+    match_tree: bool = False,
+    exact: bool = False,
+) -> list[DuplicateGroup]:
+    """
+    Group materials by content signature. With match_tree, their existing node trees have to match too,
+    which is required to clone a built graph. With exact, their whole I3D attributes and node trees have to
+    match, which is required to merge the materials, as they then export the same.
+    """
+    buckets: dict[tuple[str, str, str], list[bpy.types.Material]] = defaultdict(list)
+    for mat in materials:
+        key = (
+            material_signature(mat, index),
+            tree_signature(mat) if match_tree or exact else "",
+            attributes_signature(mat) if exact else "",
+        )
+        buckets[key].append(mat)
+    return [DuplicateGroup(mats[0], mats[1:]) for mats in buckets.values() if len(mats) > 1]
+
+
+def merge_duplicates(groups: list[DuplicateGroup]) -> int:
+    """
+    Remap every user of each duplicate (material slots included) to its group's prototype.
+    The duplicates are left without users, so Blender drops them on save. Returns the number merged.
+    """
+    merged = 0
+    for group in groups:
+        for mat in group.duplicates:
+            mat.user_remap(group.prototype)
+            merged += 1
+    return merged
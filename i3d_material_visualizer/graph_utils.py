@@ -1,40 +1,156 @@
+import hashlib
+import math
+from collections import defaultdict
+
 import bpy
 from bpy_extras.node_utils import connect_sockets
 
 from .constants import AUTO_FLAG, ROLE_PROP
+from .library import get_node_group
+from .report import count
 from .specs import NodeSpec
 
 
-def ensure_node(mat: bpy.types.Material, spec: NodeSpec) -> bpy.types.Node:
-    """Ensure a node of the given spec exists in the material's node tree."""
-    nodes = mat.node_tree.nodes
-    node = nodes.get(spec.role)
+class TreeIndex:
+    """
+    Nodes of a tree by name and by type, and its links by the node they enter and leave, gathered in one pass.
+    Visualizer nodes are named after their role, so the name map doubles as the role map. Nodes and links added or
+    removed through the index keep it current; links made elsewhere (link_sockets) are not tracked.
+    """
+
+    def __init__(self, node_tree: bpy.types.NodeTree):
+        self.node_tree = node_tree
+        self.nodes: list[bpy.types.Node] = list(node_tree.nodes)  # in tree order
+        self.by_name: dict[str, bpy.types.Node] = {}
+        self.by_type: dict[str, list[bpy.types.Node]] = defaultdict(list)
+        for node in self.nodes:
+            self.by_name[node.name] = node
+            self.by_type[node.bl_idname].append(node)
+        self._links_in: dict[str, list[bpy.types.NodeLink]] = defaultdict(list)  # to_node name -> links
+        self._links_out: dict[str, list[bpy.types.NodeLink]] = defaultdict(list)  # from_node name -> links
+        for link in node_tree.links:
+            self._links_in[link.to_node.name].append(link)
+            self._links_out[link.from_node.name].append(link)
+
+    def get(self, name: str) -> bpy.types.Node | None:
+        return self.by_name.get(name)
+
+    def new(self, bl_idname: str, name: str | None = None) -> bpy.types.Node:
+        node = self.node_tree.nodes.new(bl_idname)
+        if name:
+            node.name = name
+        self.nodes.append(node)
+        self.by_name[node.name] = node
+        self.by_type[bl_idname].append(node)
+        count("nodes created")
+        return node
+
+    def remove(self, node: bpy.types.Node) -> None:
+        name = node.name
+        for link in self._links_in.pop(name, ()):
+            self._links_out[link.from_node.name].remove(link)
+        for link in self._links_out.pop(name, ()):
+            self._links_in[link.to_node.name].remove(link)
+        self.nodes.remove(node)
+        self.by_type[node.bl_idname].remove(node)
+        del self.by_name[name]
+        self.node_tree.nodes.remove(node)
+        count("nodes removed")
+
+    def link(self, from_socket: bpy.types.NodeSocket, to_socket: bpy.types.NodeSocket) -> bpy.types.NodeLink:
+        """Link two sockets, replacing the link into to_socket like NodeLinks.new does."""
+        if not to_socket.is_multi_input:
+            for old in [old for old in self._links_in[to_socket.node.name] if old.to_socket == to_socket]:
+                self._links_in[to_socket.node.name].remove(old)
+                self._links_out[old.from_node.name].remove(old)
+        link = self.node_tree.links.new(from_socket, to_socket)
+        self._links_in[to_socket.node.name].append(link)
+        self._links_out[from_socket.node.name].append(link)
+        count("links made")
+        return link
+
+    def unlink(self, link: bpy.types.NodeLink) -> None:
+        self._links_in[link.to_node.name].remove(link)
+        self._links_out[link.from_node.name].remove(link)
+        self.node_tree.links.remove(link)
+        count("links removed")
+
+    def linked_from(self, node: bpy.types.Node, input_name: str) -> bpy.types.Node | None:
+        """The node feeding the named input, if it is linked."""
+        links = self._links_in.get(node.name, ())
+        return next((lnk.from_node for lnk in links if lnk.to_socket.name == input_name), None)
+
+    def links_from(self, node: bpy.types.Node, output_name: str | None = None) -> list[bpy.types.NodeLink]:
+        """Links leaving the named output, or every output of the node."""
+        links = self._links_out.get(node.name, ())
+        return [lnk for lnk in links if output_name is None or lnk.from_socket.name == output_name]
+
+    def auto_nodes(self) -> list[bpy.types.Node]:
+        return [node for node in self.nodes if node.get(AUTO_FLAG)]
+
+
+def ensure_node(
+    mat: bpy.types.Material,
+    spec: NodeSpec,
+    index: TreeIndex | None = None,
+    groups: dict[str, bpy.types.NodeTree] | None = None,
+) -> bpy.types.Node:
+    """
+    Ensure a node of the given spec exists in the material's node tree.
+    `groups` maps spec group names to the node groups to assign in their place, e.g. a shader variant.
+    """
+    index = index or TreeIndex(mat.node_tree)
+    node = index.get(spec.role)
     if not node:
-        node = nodes.new(spec.bl_idname)
-        node.name = node.label = spec.role
+        node = index.new(spec.bl_idname, spec.role)
+        node.label = spec.role
         try:
             node[AUTO_FLAG] = True
         except Exception:
             pass
     if spec.group and hasattr(node, "node_tree"):
-        nt = bpy.data.node_groups.get(spec.group)
-        if nt:
+        nt = (groups or {}).get(spec.group) or get_node_group(spec.group)
+        if nt and node.node_tree != nt:
             node.node_tree = nt
+            count("rna writes")
     for k, v in spec.props.items():
         try:
-            setattr(node, k, v)
+            if getattr(node, k) != v:
+                setattr(node, k, v)
+                count("rna writes")
         except Exception:
             print(f"Could not set prop {k} on {node.name}")
     for name, val in spec.inputs_defaults.items():
         sock = node.inputs.get(name)
-        if sock is None:
+        if sock is None or values_equal(getattr(sock, "default_value", None), val):
             continue
         _safe_assign(sock, val)
+        count("rna writes")
+    tag_role(node, spec.role)
+    return node
+
+
+def tag_role(node: bpy.types.Node, role: str) -> None:
+    """Store the visualizer role on the node, skipping the write when it is already set."""
     try:
-        node[ROLE_PROP] = spec.role
+        if node.get(ROLE_PROP) != role:
+            node[ROLE_PROP] = role
+            count("rna writes")
     except Exception:
         pass
-    return node
+
+
+def values_equal(current: object, target: object, abs_tol: float = 1e-6) -> bool:
+    """Compare a socket/property value with a target value, with tolerance for floats and float vectors."""
+    if isinstance(target, (tuple, list)):
+        try:
+            current = tuple(current)
+        except TypeError:
+            return False
+        return len(current) == len(target) and all(values_equal(c, t, abs_tol) for c, t in zip(current, target))
+    if isinstance(target, (int, float)) and isinstance(current, (int, float)):
+        return math.isclose(current, target, rel_tol=0.0, abs_tol=abs_tol)
+    return current == target
 
 
 def _safe_assign(sock: bpy.types.NodeSocket, val: object) -> None:
@@ -75,32 +191,57 @@ def link_sockets(
         if from_node
         else find_socket(other_node, other_sock_name, is_input=True)
     )
-    if src_sock and dst_sock:
+    if src_sock and dst_sock and not any(link.from_socket == src_sock for link in dst_sock.links):
         connect_sockets(src_sock, dst_sock)
+        count("links made")
 
 
 def apply_presentation(node: bpy.types.Node, spec: NodeSpec) -> None:
     """Apply presentation settings from spec to node."""
-    if spec.collapsed:
+    if spec.collapsed and not node.hide:
         node.hide = True
+        count("rna writes")
     if spec.hide_unused:
         for s in (*node.inputs, *node.outputs):
             try:
-                s.hide = not s.is_linked
+                if s.hide == s.is_linked:
+                    s.hide = not s.is_linked
+                    count("rna writes")
             except Exception:
                 pass
     if spec.set_active_output:
         try:
-            node.is_active_output = True
+            if not node.is_active_output:
+                node.is_active_output = True
+                count("rna writes")
         except Exception:
             pass
 
 
-def remove_auto_nodes(mat: bpy.types.Material) -> None:
+def remove_auto_nodes(mat: bpy.types.Material, index: TreeIndex | None = None) -> None:
     """Remove nodes that were automatically created by the visualizer."""
-    nodes = mat.node_tree.nodes
-    for n in [n for n in nodes if n.get(AUTO_FLAG)]:
-        nodes.remove(n)
+    index = index or TreeIndex(mat.node_tree)
+    for n in index.auto_nodes():
+        index.remove(n)
+
+
+def park_auto_nodes(mat: bpy.types.Material, index: TreeIndex | None = None) -> None:
+    """
+    Cut every link from a visualizer-created node into one of the material's own nodes, so the original graph
+    renders and exports as before while the created nodes, their settings and images stay in the tree.
+    """
+    index = index or TreeIndex(mat.node_tree)
+    for node in index.auto_nodes():
+        for link in index.links_from(node):
+            if not link.to_node.get(AUTO_FLAG):
+                index.unlink(link)
+
+
+def remove_auto_node(mat: bpy.types.Material, role: str, index: TreeIndex | None = None) -> None:
+    """Remove the visualizer-created node of the given role, if any. Adopted nodes are kept."""
+    index = index or TreeIndex(mat.node_tree)
+    if (node := index.get(role)) and node.get(AUTO_FLAG):
+        index.remove(node)
 
 
 def parse_link_path(path: str) -> tuple[str, str, str] | None:
@@ -110,3 +251,123 @@ def parse_link_path(path: str) -> tuple[str, str, str] | None:
         return a, b, c
     except ValueError:
         return None
+
+
+def graph_fingerprint(mat: bpy.types.Material) -> str:
+    """Hash the visualizer-relevant graph state: nodes by role, links, images and UV maps."""
+    nt = mat.node_tree
+    if nt is None:
+        return ""
+    nodes = []
+    for n in nt.nodes:
+        if (role := n.get(ROLE_PROP)) is None:
+            continue
+        image = getattr(n, "image", None)
+        nodes.append(
+            (
+                role,
+                n.name,
+                n.bl_idname,
+                image.filepath if image else "",
+                getattr(n, "uv_map", ""),
+                getattr(n, "is_active_output", False),
+            )
+        )
+    links = [
+        (lnk.from_node.name, lnk.from_socket.identifier, lnk.to_node.name, lnk.to_socket.identifier) for lnk in nt.links
+    ]
+    return hashlib.sha1(repr((sorted(nodes), sorted(links))).encode()).hexdigest()
+
+
+_UNCLONED_NODE_PROPS = {"name", "select", "parent", "location_absolute"}
+
+
+def _clone_node_state(src: bpy.types.Node, dst: bpy.types.Node) -> None:
+    for prop in src.bl_rna.properties:
+        key = prop.identifier
+        if prop.is_readonly or key.startswith("bl_") or key in _UNCLONED_NODE_PROPS:
+            continue
+        value = getattr(src, key)
+        if prop.type == "FLOAT" and prop.array_length:
+            value = tuple(value)
+        if not values_equal(getattr(dst, key), value):
+            try:
+                setattr(dst, key, value)
+                count("rna writes")
+            except (AttributeError, TypeError, ValueError):
+                pass
+    for key in src.keys():
+        if dst.get(key) != src[key]:
+            dst[key] = src[key]
+    for src_socks, dst_socks in ((src.inputs, dst.inputs), (src.outputs, dst.outputs)):
+        for src_sock, dst_sock in zip(src_socks, dst_socks):
+            if dst_sock.hide != src_sock.hide:
+                dst_sock.hide = src_sock.hide
+            if hasattr(src_sock, "default_value"):
+                value = src_sock.default_value
+                value = tuple(value) if hasattr(value, "__len__") and not isinstance(value, str) else value
+                if not values_equal(dst_sock.default_value, value):
+                    _safe_assign(dst_sock, value)
+                    count("rna writes")
+
+
+def _socket_by_identifier(sockets, identifier: str) -> bpy.types.NodeSocket | None:
+    return next((s for s in sockets if s.identifier == identifier), None)
+
+
+def _clone_adopted_state(src: bpy.types.Node, dst: bpy.types.Node) -> None:
+    """Replay what a build writes into one of the material's own nodes: the image it assigns and the role tag."""
+    if hasattr(src, "image") and dst.image != src.image:
+        dst.image = src.image
+        count("rna writes")
+    tag_role(dst, src[ROLE_PROP])
+
+
+def clone_graph(src: bpy.types.Material, dst: bpy.types.Material) -> None:
+    """
+    Replay the nodes src's build created onto dst's tree, with their links, writing only what differs. Of the
+    material's own nodes that the build adopted, only the images it assigned are replayed, so their settings and
+    values stay dst's. Meant for materials whose trees matched before src was built.
+    """
+    src_nt, dst_nt = src.node_tree, dst.node_tree
+    dst_nodes = dst_nt.nodes
+    owned: set[str] = set()  # names of the nodes whose state and links are replayed in full
+    for node in src_nt.nodes:
+        if node.get(ROLE_PROP) is None:
+            continue
+        target = dst_nodes.get(node.name)
+        if target is not None and target.get(AUTO_FLAG) and target.bl_idname != node.bl_idname:
+            dst_nodes.remove(target)
+            target = None
+        if target is None:
+            target = dst_nodes.new(node.bl_idname)
+            target.name = node.name
+            count("nodes created")
+        elif not node.get(AUTO_FLAG):
+            if target.bl_idname == node.bl_idname:
+                _clone_adopted_state(node, target)
+            continue
+        _clone_node_state(node, target)
+        owned.add(node.name)
+    for node in [n for n in dst_nodes if n.get(AUTO_FLAG) and n.name not in src_nt.nodes]:
+        dst_nodes.remove(node)
+        count("nodes removed")
+
+    def key(lnk: bpy.types.NodeLink) -> tuple[str, str, str, str]:
+        return lnk.from_node.name, lnk.from_socket.identifier, lnk.to_node.name, lnk.to_socket.identifier
+
+    wanted = {key(lnk) for lnk in src_nt.links if lnk.from_node.name in owned or lnk.to_node.name in owned}
+    for lnk in list(dst_nt.links):
+        if (k := key(lnk)) in wanted:
+            wanted.discard(k)
+        elif lnk.from_node.name in owned or lnk.to_node.name in owned:
+            dst_nt.links.remove(lnk)
+    for from_name, from_id, to_name, to_id in wanted:
+        from_node, to_node = dst_nodes.get(from_name), dst_nodes.get(to_name)
+        if not (from_node and to_node):
+            continue
+        from_sock = _socket_by_identifier(from_node.outputs, from_id)
+        to_sock = _socket_by_identifier(to_node.inputs, to_id)
+        if from_sock and to_sock:
+            dst_nt.links.new(from_sock, to_sock)
+            count("links made")
@@ -0,0 +1,142 @@
+import hashlib
+from pathlib import Path
+
+import bpy
+
+from .constants import SHADER_HASH_PROP, VEHICLE_SHADER_GROUP_NAME
+from .prefs import shader_import_mode
+
+SHADER_LIBRARY = Path(__file__).parent / "shader.blend"
+
+_library_hash: str | None = None
+_shader_group: bpy.types.NodeTree | None = None  # resolved group, cached for the session
+
+
+def library_hash() -> str:
+    """Content hash of the bundled shader.blend, stamped on appended groups to detect outdated copies."""
+    global _library_hash
+    if _library_hash is None:
+        _library_hash = hashlib.sha1(SHADER_LIBRARY.read_bytes()).hexdigest()
+    return _library_hash
+
+
+def _is_alive(group: bpy.types.NodeTree | None) -> bool:
+    try:
+        return group is not None and bool(group.name)
+    except ReferenceError:
+        return False
+
+
+def _is_our_library(library: bpy.types.Library) -> bool:
+    return Path(bpy.path.abspath(library.filepath)).resolve() == SHADER_LIBRARY.resolve()
+
+
+def _find_existing() -> bpy.types.NodeTree | None:
+    """Find the vehicle shader group, also when it was renamed (appended copies carry the hash stamp)."""
+    candidates = [
+        group
+        for group in bpy.data.node_groups
+        if group.name == VEHICLE_SHADER_GROUP_NAME or (group.library is None and SHADER_HASH_PROP in group)
+    ]
+    # Prefer a linked group from our library, then a current copy, then anything else
+    candidates.sort(
+        key=lambda g: (
+            not (g.library and _is_our_library(g.library)),
+            g.get(SHADER_HASH_PROP) != library_hash(),
+            g.name != VEHICLE_SHADER_GROUP_NAME,
+        )
+    )
+    return candidates[0] if candidates else None
+
+
+def _load(link: bool) -> bpy.types.NodeTree | None:
+    try:
+        with bpy.data.libraries.load(str(SHADER_LIBRARY), link=link) as (data_from, data_to):
+            data_to.node_groups = [VEHICLE_SHADER_GROUP_NAME]
+    except Exception as e:
+        print(f"Failed to import shader from {SHADER_LIBRARY}: {e}")
+        return None
+    group = data_to.node_groups[0] if data_to.node_groups else None
+    if group is not None and not link:
+        group[SHADER_HASH_PROP] = library_hash()
+    return group
+
+
+def _replace(old: bpy.types.NodeTree, new: bpy.types.NodeTree) -> bpy.types.NodeTree:
+    """Swap every user of `old` over to `new` in place, then drop `old`."""
+    old.user_remap(new)
+    bpy.data.node_groups.remove(old)
+    if new.library is None:
+        new.name = VEHICLE_SHADER_GROUP_NAME
+    return new
+
+
+def _resolve(link: bool) -> bpy.types.NodeTree | None:
+    existing = _find_existing()
+    if existing is None:
+        return _load(link)
+
+    if existing.library is not None:
+        if not _is_our_library(existing.library):  # linked from an old addon location
+            existing.library.filepath = str(SHADER_LIBRARY)
+            existing.library.reload()
+        if link:
+            return existing
+        local = existing.make_local()  # may return a new local copy rather than convert in place
+        local[SHADER_HASH_PROP] = library_hash()
+        return local
+
+    if link:
+        return _replace(existing, new) if (new := _load(link=True)) else existing
+    if existing.get(SHADER_HASH_PROP) != library_hash():
+        return _replace(existing, new) if (new := _load(link=False)) else existing
+    if existing.name != VEHICLE_SHADER_GROUP_NAME:
+        existing.name = VEHICLE_SHADER_GROUP_NAME
+    return existing
+
+
+def get_shader_group() -> bpy.types.NodeTree | None:
+    """
+    Return the vehicle shader node group, linking or appending it from the bundled shader.blend if missing.
+    Outdated appended copies are upgraded in place and the result is cached for the rest of the session.
+    """
+    global _shader_group
+    if not _is_alive(_shader_group):
+        _shader_group = _resolve(link=shader_import_mode() == "LINK")
+    return _shader_group
+
+
+def get_node_group(name: str) -> bpy.types.NodeTree | None:
+    if name == VEHICLE_SHADER_GROUP_NAME:
+        return get_shader_group()
+    return bpy.data.node_groups.get(name)
+
+
+def invalidate_shader_group() -> None:
+    global _shader_group
+    _shader_group = None
+
+
+@bpy.app.handlers.persistent
+def _invalidate_on_file_change(*_args) -> None:
+    invalidate_shader_group()
+
+
+_CACHE_HANDLERS = (
+    bpy.app.handlers.load_post,
+    bpy.app.handlers.undo_post,
+    bpy.app.handlers.redo_post,
+)
+
+
+def register():
+    for handlers in _CACHE_HANDLERS:
+        if _invalidate_on_file_change not in handlers:
+            handlers.append(_invalidate_on_file_change)
+
+
+def unregister():
+    for handlers in _CACHE_HANDLERS:
+        if _invalidate_on_file_change in handlers:
+            handlers.remove(_invalidate_on_file_change)
+    invalidate_shader_group()
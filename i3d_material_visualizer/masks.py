@@ -0,0 +1,184 @@
+import bpy
+
+from .constants import MASK_CONTROL_GROUP_NAME, VEHICLE_SHADER_GROUP_NAME
+from .library import get_shader_group
+from .specialize import shader_variant
+from .utils import is_vehicle_shader
+
+MASKS = {
+    "Scratches": "show_scratches",
+    "Dirt": "show_dirt",
+    "Snow": "show_snow",
+    "Wetness": "show_wetness",
+    "Wetness Mask": "show_wetness_mask",
+}
+
+DEBOUNCE_INTERVAL = 0.05  # seconds; mask toggles within this window are written in one pass
+
+
+def mask_states(props) -> dict[str, bool]:
+    """The scene mask toggles by vehicle shader group input name."""
+    return {name: getattr(props, attr) for name, attr in MASKS.items()}
+
+
+def shader_group_for(props) -> bpy.types.NodeTree | None:
+    """The vehicle shader group visualized materials use: with specialized shaders, the variant for the toggles."""
+    if props.use_specialized_shaders and not props.use_global_masks:
+        return shader_variant(mask_states(props))
+    return get_shader_group()
+
+
+def ensure_mask_control_group() -> bpy.types.NodeTree:
+    """
+    Get or create the shared mask control group: one Value node per mask feeding a group output.
+    In global mask mode every visualized material links this group into its vehicle shader node, so a
+    toggle is a single write here instead of one write per material.
+    """
+    group = bpy.data.node_groups.get(MASK_CONTROL_GROUP_NAME)
+    if group is None:
+        group = bpy.data.node_groups.new(MASK_CONTROL_GROUP_NAME, "ShaderNodeTree")
+    nodes = group.nodes
+    output = next((n for n in nodes if n.bl_idname == "NodeGroupOutput"), None)
+    if output is None:
+        output = nodes.new("NodeGroupOutput")
+        output.location = (200, 0)
+    for i, name in enumerate(MASKS):
+        if group.interface.items_tree.get(name) is None:
+            group.interface.new_socket(name, in_out="OUTPUT", socket_type="NodeSocketFloat")
+        if (value := nodes.get(name)) is None:
+            value = nodes.new("ShaderNodeValue")
+            value.name = value.label = name
+            value.location = (0, -100 * i)
+        if not value.outputs[0].is_linked:
+            group.links.new(value.outputs[0], output.inputs[name])
+    return group
+
+
+class MaskController:
+    """Writes the scene mask toggles into every visualized material, coalescing rapid toggles."""
+
+    def __init__(self):
+        # material -> mask input socket indices on its vehicle shader group node. Indices rather than socket
+        # references are cached, so a node deleted by the user can't leave a dangling pointer behind.
+        self._targets: list[tuple[bpy.types.Material, dict[str, int]]] | None = None
+        # Materials in the file when the targets were collected: duplicating, appending or deleting one changes it
+        self._material_count = 0
+        self._pending_scene: str | None = None
+
+    def invalidate(self) -> None:
+        """Forget the cached material sockets, e.g. after materials were visualized or disabled."""
+        self._targets = None
+
+    def _collect_targets(self) -> list[tuple[bpy.types.Material, dict[str, int]]]:
+        self._material_count = len(bpy.data.materials)
+        targets = []
+        for mat in bpy.data.materials:
+            if mat.users == 0 or not mat.node_tree or not is_vehicle_shader(mat):
+                continue
+            if not (node := mat.node_tree.nodes.get(VEHICLE_SHADER_GROUP_NAME)):
+                continue
+            indices = {sock.name: i for i, sock in enumerate(node.inputs) if sock.name in MASKS}
+            if indices:
+                targets.append((mat, indices))
+        return targets
+
+    def request(self, scene: bpy.types.Scene) -> None:
+        """
+        Schedule a write of the scene mask states; repeated requests before it runs are merged.
+        Timers don't run in background scripts, so there the write happens right away.
+        """
+        self._pending_scene = scene.name
+        if bpy.app.background:
+            self.flush()
+        elif not bpy.app.timers.is_registered(_flush_pending_masks):
+            bpy.app.timers.register(_flush_pending_masks, first_interval=DEBOUNCE_INTERVAL)
+
+    def cancel(self) -> None:
+        self._pending_scene = None
+        if bpy.app.timers.is_registered(_flush_pending_masks):
+            bpy.app.timers.unregister(_flush_pending_masks)
+
+    def flush(self) -> None:
+        """Write the pending mask request now, if any."""
+        scene = bpy.data.scenes.get(self._pending_scene or "")
+        self._pending_scene = None
+        if scene:
+            self.apply(scene.i3d_material)
+
+    def apply(self, props) -> int:
+        """
+        Write all mask states in one pass per material. Returns the number of sockets written.
+        With specialized shaders, the materials are also switched to the shader variant compiled for the states.
+        """
+        states = mask_states(props)
+        if props.use_global_masks:
+            return self._write_global(states)
+        group = shader_group_for(props)
+        try:
+            return self._write(states, group)
+        except (ReferenceError, LookupError):  # a cached material or group node changed
+            self.invalidate()
+            return self._write(states, group)
+
+    def _write_global(self, states: dict[str, bool]) -> int:
+        nodes = ensure_mask_control_group().nodes
+        written = 0
+        for name, state in states.items():
+            sock = nodes[name].outputs[0]
+            if bool(sock.default_value) != state:
+                sock.default_value = float(state)
+                written += 1
+        return written
+
+    def _write(self, states: dict[str, bool], group: bpy.types.NodeTree | None = None) -> int:
+        if self._targets is None or self._material_count != len(bpy.data.materials):
+            self._targets = self._collect_targets()
+        written = 0
+        for mat, indices in self._targets:
+            if not (node := mat.node_tree.nodes.get(VEHICLE_SHADER_GROUP_NAME)):
+                raise LookupError(mat.name)
+            if group is not None and node.node_tree != group:
+                node.node_tree = group  # variants share the shader's interface, so the socket indices still hold
+            inputs = node.inputs
+            for name, i in indices.items():
+                sock = inputs[i]
+                if sock.name != name:
+                    raise LookupError(name)
+                if bool(sock.default_value) != states[name]:
+                    sock.default_value = states[name]
+                    written += 1
+        return written
+
+
+mask_controller = MaskController()
+
+
+def _flush_pending_masks() -> None:
+    mask_controller.flush()
+    return None  # one-shot timer
+
+
+@bpy.app.handlers.persistent
+def _invalidate_on_file_change(*_args) -> None:
+    mask_controller.invalidate()
+
+
+_CACHE_HANDLERS = (
+    bpy.app.handlers.load_post,
+    bpy.app.handlers.undo_post,
+    bpy.app.handlers.redo_post,
+)
+
+
+def register():
+    for handlers in _CACHE_HANDLERS:
+        if _invalidate_on_file_change not in handlers:
+            handlers.append(_invalidate_on_file_change)
+
+
+def unregister():
+    mask_controller.cancel()
+    mask_controller.invalidate()
+    for handlers in _CACHE_HANDLERS:
+        if _invalidate_on_file_change in handlers:
+            handlers.remove(_invalidate_on_file_change)
@@ -1,11 +1,95 @@
-from collections import defaultdict
-
 import bpy
 
-from .builder import MaterialVisualizer
+from . import runtime
 from .constants import VEHICLE_SHADER_GROUP_NAME
-from .sync import SyncDirection, get_fs_data_path_from_i3dio, sync_param, sync_params, sync_textures
-from .utils import find_uv_inconsistencies, is_vehicle_shader
+from .prefs import build_budget_ms, get_fs_data_path_from_i3dio
+from .scheduler import TICK_INTERVAL
+from .utils import is_vehicle_shader
+
+# Operators import the builder and sync machinery in execute(), so registering them stays cheap.
+# Directions are given as the SyncDirection values for the same reason.
+
+# Events passed on while a time-sliced operator runs, so the viewport can be navigated to watch the build
+NAVIGATION_EVENTS = {
+    "MOUSEMOVE",
+    "INBETWEEN_MOUSEMOVE",
+    "MIDDLEMOUSE",
+    "WHEELUPMOUSE",
+    "WHEELDOWNMOUSE",
+    "TRACKPADPAN",
+    "TRACKPADZOOM",
+    "MOUSEROTATE",
+    "NDOF_MOTION",
+}
+
+
+class TimeSlicedOperator:
+    """
+    Mixin for bulk operators whose work is a scheduler.TimeSlicedJob. execute() runs the job to the end, for
+    scripts and redo. invoke() runs it from a modal timer, a time slice per tick, with progress in the status bar;
+    Esc stops it between two materials and keeps what was built so far.
+
+    Operators define create_job(context), returning the job or None when there is nothing to do (after reporting
+    why), and finish_job(context, job), reporting the outcome, also when the job was cancelled.
+    """
+
+    def execute(self, context):
+        runtime.load()
+        if (job := self.create_job(context)) is None:
+            return {"FINISHED"}
+        job.run()
+        self.finish_job(context, job)
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        runtime.load()
+        if (job := self.create_job(context)) is None:
+            return {"FINISHED"}
+        if context.window is None or job.run(build_budget_ms()):
+            job.run()
+            self.finish_job(context, job)
+            return {"FINISHED"}
+        self._job = job
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(TICK_INTERVAL, window=context.window)
+        wm.progress_begin(0, job.total)
+        wm.modal_handler_add(self)
+        self._show_progress(context)
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        job = self._job
+        if event.type == "ESC":
+            job.cancel()
+            self._end(context)
+            self.report({"WARNING"}, f"Cancelled after {job.done} of {job.total} materials.")
+            self.finish_job(context, job)
+            return {"FINISHED"}  # keep the materials built so far in the undo step
+        if event.type != "TIMER" or event.timer != self._timer:
+            return {"PASS_THROUGH"} if event.type in NAVIGATION_EVENTS else {"RUNNING_MODAL"}
+        if job.run(build_budget_ms()):
+            self._end(context)
+            self.finish_job(context, job)
+            return {"FINISHED"}
+        self._show_progress(context)
+        return {"RUNNING_MODAL"}
+
+    def cancel(self, context):
+        """Called by Blender when the modal run is aborted, e.g. by loading another file."""
+        self._job.cancel()
+        self._end(context)
+
+    def _show_progress(self, context) -> None:
+        context.window_manager.progress_update(self._job.done)
+        if context.workspace:
+            context.workspace.status_text_set(self._job.status)
+
+    def _end(self, context) -> None:
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        if context.workspace:
+            context.workspace.status_text_set(None)
 
 
 class I3DMaterialVisualizer_OT_sync_shader(bpy.types.Operator):
@@ -19,10 +103,10 @@ class I3DMaterialVisualizer_OT_sync_shader(bpy.types.Operator):
         name="Direction",
         description="Choose how to sync data",
         items=[
-            (SyncDirection.PROPS_TO_NODES, "Apply to Shader (Props → Nodes)", "Mat props -> Blender shader nodes"),
-            (SyncDirection.NODES_TO_PROPS, "Read from Shader (Nodes → Props)", "Blender shader nodes -> Mat props"),
+            ("PROPS_TO_NODES", "Apply to Shader (Props → Nodes)", "Mat props -> Blender shader nodes"),
+            ("NODES_TO_PROPS", "Read from Shader (Nodes → Props)", "Blender shader nodes -> Mat props"),
         ],
-        default=SyncDirection.PROPS_TO_NODES,
+        default="PROPS_TO_NODES",
     )
 
     single_param: bpy.props.StringProperty(default="", options={"HIDDEN"})
@@ -38,7 +122,7 @@ class I3DMaterialVisualizer_OT_sync_shader(bpy.types.Operator):
         tips = "• Shift: Skip colorScale    • Ctrl: Only colorScale\n"
         head = (
             "Props → Nodes (apply to shader)\n"
-            if properties.direction == SyncDirection.PROPS_TO_NODES
+            if properties.direction == "PROPS_TO_NODES"
             else "Nodes → Props (read from shader)\n"
         )
         return head + tips
@@ -48,34 +132,46 @@ class I3DMaterialVisualizer_OT_sync_shader(bpy.types.Operator):
         return context.material
 
     def execute(self, context):
+        runtime.load()
+        from .builder import MaterialVisualizer, has_unbuilt_textures
+        from .sync import sync_param, sync_params, sync_textures
+
         mat = context.material
 
         if not is_vehicle_shader(mat):
             self.report({"ERROR"}, "Material is not using vehicleShader.")
             return {"CANCELLED"}
 
-        if self.direction == SyncDirection.PROPS_TO_NODES and VEHICLE_SHADER_GROUP_NAME not in mat.node_tree.nodes:
+        if self.direction == "PROPS_TO_NODES" and (
+            VEHICLE_SHADER_GROUP_NAME not in mat.node_tree.nodes or has_unbuilt_textures(mat)
+        ):
             MaterialVisualizer.enable(mat)
 
         if self.single_param:
-            sync_param(mat, self.single_param, self.direction)
-            msg = "Applied" if self.direction == SyncDirection.PROPS_TO_NODES else "Read"
-            self.report({"INFO"}, f"{msg} {self.single_param!r} on {mat.name!r}.")
+            changed = sync_param(mat, self.single_param, self.direction)
+            msg = "Applied" if self.direction == "PROPS_TO_NODES" else "Read"
+            state = "" if changed else " (already in sync)"
+            self.report({"INFO"}, f"{msg} {self.single_param!r} on {mat.name!r}{state}.")
             return {"FINISHED"}
 
         # Bulk parameters
-        sync_params(mat, self.direction, skip_color_scale=self.skip_color_scale, only_color_scale=self.only_color_scale)
+        changed = sync_params(
+            mat, self.direction, skip_color_scale=self.skip_color_scale, only_color_scale=self.only_color_scale
+        )
 
         # bulk textures
         if not self.only_color_scale:
-            sync_textures(mat, self.direction)
+            changed |= sync_textures(mat, self.direction)
 
+        if not changed:
+            self.report({"INFO"}, f"{mat.name!r} is already in sync.")
+            return {"FINISHED"}
         msg = (
             "Applied props/textures to shader"
-            if self.direction == SyncDirection.PROPS_TO_NODES
+            if self.direction == "PROPS_TO_NODES"
             else "Read shader into props/textures"
         )
-        self.report({"INFO"}, f"{msg}: {mat.name!r}.")
+        self.report({"INFO"}, f"{msg}: {mat.name!r} ({', '.join(sorted(changed))}).")
         return {"FINISHED"}
 
     def invoke(self, context, event):
@@ -85,67 +181,167 @@ class I3DMaterialVisualizer_OT_sync_shader(bpy.types.Operator):
         return self.execute(context)
 
 
+class I3DMaterialVisualizer_OT_sync_materials(bpy.types.Operator):
+    bl_idname = "i3d_material_visualizer.sync_materials"
+    bl_label = "Sync Materials"
+    bl_description = "Sync I3D attributes and the visualizer shader nodes of many materials at once"
+    bl_options = {"REGISTER", "UNDO"}
+
+    direction: bpy.props.EnumProperty(
+        name="Direction",
+        description="Choose how to sync data",
+        items=[
+            ("PROPS_TO_NODES", "Apply to Shader (Props → Nodes)", "Mat props -> Blender shader nodes"),
+            ("NODES_TO_PROPS", "Read from Shader (Nodes → Props)", "Blender shader nodes -> Mat props"),
+        ],
+        default="PROPS_TO_NODES",
+    )
+    scope: bpy.props.EnumProperty(
+        name="Materials",
+        description="Which vehicleShader materials to sync",
+        items=[
+            ("SELECTED", "Selected Objects", "Materials on the selected objects"),
+            ("VISUALIZED", "Visualized", "All visualized materials"),
+            ("PATTERN", "Name Pattern", "Materials whose name matches a pattern"),
+        ],
+        default="SELECTED",
+    )
+    pattern: bpy.props.StringProperty(
+        name="Pattern",
+        description="Material name pattern, with * and ? wildcards (case-insensitive)",
+        default="*",
+    )
+    skip_color_scale: bpy.props.BoolProperty(name="Skip Color Scale", default=False)
+    only_color_scale: bpy.props.BoolProperty(name="Only Color Scale", default=False)
+
+    @classmethod
+    def poll(cls, context):
+        return get_fs_data_path_from_i3dio()
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.prop(self, "direction")
+        layout.prop(self, "scope")
+        if self.scope == "PATTERN":
+            layout.prop(self, "pattern")
+        layout.prop(self, "skip_color_scale")
+        layout.prop(self, "only_color_scale")
+
+    def execute(self, context):
+        runtime.load()
+        from .batch import materials_in_scope, sync_materials
+
+        materials = materials_in_scope(context, self.scope, self.pattern)
+        if not materials:
+            self.report({"WARNING"}, "No vehicleShader materials in scope.")
+            return {"CANCELLED"}
+
+        report = sync_materials(
+            materials,
+            self.direction,
+            operator=self,
+            skip_color_scale=self.skip_color_scale and not self.only_color_scale,
+            only_color_scale=self.only_color_scale,
+        )
+        counters = report.counters
+        self.report(
+            {"INFO"},
+            f"Synced {counters['materials']} materials: {counters['materials changed']} changed "
+            f"({counters['params written']} params, {counters['textures written']} textures) "
+            f"in {report.summary()}.",
+        )
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+
 class I3DMaterialVisualizer_OT_copy_attributes(bpy.types.Operator):
     bl_idname = "i3d_material_visualizer.copy_attributes"
     bl_label = "Copy Material Attributes"
-    bl_description = "Copy attributes from source material to destination material"
+    bl_description = "Copy attributes from source material to destination materials"
     bl_options = {"INTERNAL", "UNDO"}
 
     skip_color_scale: bpy.props.BoolProperty(default=False, options={"HIDDEN"})
     only_color_scale: bpy.props.BoolProperty(default=False, options={"HIDDEN"})
+    targets: bpy.props.EnumProperty(
+        name="Targets",
+        items=[
+            ("DESTINATION", "Destination", "The destination material"),
+            ("SELECTED", "Selected Objects", "vehicleShader materials on the selected objects"),
+            ("COLLECTION", "Collection", "vehicleShader materials on the objects of the destination collection"),
+        ],
+        default="DESTINATION",
+        options={"HIDDEN"},
+    )
 
     @classmethod
     def description(cls, context, properties):
         settings = "• Hold Shift: Skip color scale\n• Hold Ctrl: Only apply color scale\n"
-        return "Copy attributes from source material to destination material.\n" + settings
+        targets = {
+            "DESTINATION": "destination material",
+            "SELECTED": "materials of the selected objects",
+            "COLLECTION": "materials of the destination collection",
+        }[properties.targets]
+        return f"Copy attributes from source material to {targets}.\n" + settings
 
     @classmethod
     def poll(cls, context):
         scene_props = context.scene.i3d_material
-        if not (scene_props.src_material and scene_props.dst_material and get_fs_data_path_from_i3dio()):
+        if not (scene_props.src_material and get_fs_data_path_from_i3dio()):
             return False
 
-        return is_vehicle_shader(scene_props.src_material) and is_vehicle_shader(scene_props.dst_material)
+        return is_vehicle_shader(scene_props.src_material)
 
     def execute(self, context):
+        runtime.load()
+        from .batch import copy_attributes, materials_in_scope
+
         scene_props = context.scene.i3d_material
         src_material = scene_props.src_material
-        dst_material = scene_props.dst_material
-
-        if src_material == dst_material:
-            self.report({"ERROR"}, "Source and destination materials cannot be the same.")
-            return {"CANCELLED"}
-
-        dst_params = dst_material.i3d_attributes.shader_material_params
-        for key, value in src_material.i3d_attributes.shader_material_params.items():
-            dst_params[key] = value
-
-        for s, d in zip(
-            src_material.i3d_attributes.shader_material_textures, dst_material.i3d_attributes.shader_material_textures
-        ):
-            d.source = s.source
 
-        MaterialVisualizer.enable(dst_material)
-        sync_params(
-            dst_material,
-            SyncDirection.PROPS_TO_NODES,
+        if self.targets == "DESTINATION":
+            dst_material = scene_props.dst_material
+            if not (dst_material and is_vehicle_shader(dst_material)):
+                self.report({"ERROR"}, "Destination material must use vehicleShader.")
+                return {"CANCELLED"}
+            if src_material == dst_material:
+                self.report({"ERROR"}, "Source and destination materials cannot be the same.")
+                return {"CANCELLED"}
+            destinations = [dst_material]
+        else:
+            destinations = materials_in_scope(context, self.targets, collection=scene_props.dst_collection)
+            destinations = [mat for mat in destinations if mat != src_material]
+            if not destinations:
+                self.report({"WARNING"}, "No destination vehicleShader materials found.")
+                return {"CANCELLED"}
+
+        report = copy_attributes(
+            src_material,
+            destinations,
+            operator=self,
             skip_color_scale=self.skip_color_scale,
             only_color_scale=self.only_color_scale,
         )
-        if not self.only_color_scale:
-            sync_textures(dst_material, SyncDirection.PROPS_TO_NODES)
-
-        self.report({"INFO"}, "Material attributes copied successfully.")
+        counters = report.counters
+        if len(destinations) == 1:
+            self.report({"INFO"}, "Material attributes copied successfully.")
+        else:
+            self.report(
+                {"INFO"},
+                f"Copied attributes to {counters['materials']} materials "
+                f"({counters['materials changed']} changed, {counters['materials rebuilt']} rebuilt).",
+            )
         return {"FINISHED"}
 
     def invoke(self, context, event):
         self.skip_color_scale = event.shift and not event.ctrl  # If shift is pressed, skip colorScale
         self.only_color_scale = event.ctrl and not event.shift  # If ctrl is pressed, only colorScale
-        self.execute(context)
-        return {"FINISHED"}
+        return self.execute(context)
 
 
-class I3DMaterialVisualizer_OT_visualize_all(bpy.types.Operator):
+class I3DMaterialVisualizer_OT_visualize_all(TimeSlicedOperator, bpy.types.Operator):
     bl_idname = "i3d_material_visualizer.visualize_all"
     bl_label = "Visualize All Materials"
     bl_description = "Visualize all materials in the scene using I3D Material Visualizer"
@@ -157,21 +353,43 @@ class I3DMaterialVisualizer_OT_visualize_all(bpy.types.Operator):
         default=True,
         options={"HIDDEN"},
     )
+    purge: bpy.props.BoolProperty(
+        name="Purge",
+        description="Remove the visualizer nodes when disabling, even if Purge on Disable is off",
+        default=False,
+        options={"HIDDEN"},
+    )
+
+    @classmethod
+    def description(cls, context, properties):
+        if properties.enable:
+            return cls.bl_description
+        if properties.purge:
+            return "Disable visualization of all materials and remove their visualizer nodes"
+        return "Disable visualization of all materials, keeping their visualizer nodes for a quick re-enable"
 
     @classmethod
     def poll(cls, context):
         return get_fs_data_path_from_i3dio()
 
-    def execute(self, context):
-        for material in bpy.data.materials:
-            if material.users == 0:
-                continue
-            if is_vehicle_shader(material):
-                material.i3d_visualized = self.enable
-        return {"FINISHED"}
+    def create_job(self, context):
+        from .batch import iter_visualize_materials
+        from .report import Report
+        from .scheduler import TimeSlicedJob
+
+        materials = [mat for mat in bpy.data.materials if mat.users > 0 and is_vehicle_shader(mat)]
+        scene_props = context.scene.i3d_material
+        purge = self.purge or scene_props.purge_on_disable
+        self._report = Report(self, profile=True)
+        steps = iter_visualize_materials(materials, self.enable, self._report, scene_props.deduplicate_builds, purge)
+        return TimeSlicedJob(steps, len(materials), "Visualizing" if self.enable else "Disabling")
+
+    def finish_job(self, context, job):
+        action = "Visualized" if self.enable else "Disabled"
+        self.report({"INFO"}, f"{action} {job.done} materials in {self._report.summary()}.")
 
 
-class I3DMaterialVisualizer_OT_standardize_uvs(bpy.types.Operator):
+class I3DMaterialVisualizer_OT_standardize_uvs(TimeSlicedOperator, bpy.types.Operator):
     bl_idname = "i3d_material_visualizer.standardize_uvs"
     bl_label = "Check & Standardize UV Maps"
     bl_description = (
@@ -179,51 +397,116 @@ class I3DMaterialVisualizer_OT_standardize_uvs(bpy.types.Operator):
     )
     bl_options = {"INTERNAL", "UNDO"}
 
+    dry_run: bpy.props.BoolProperty(
+        name="Dry Run",
+        description="Only report the UV maps that would be renamed",
+        default=False,
+        options={"HIDDEN"},
+    )
+
     @classmethod
     def poll(cls, context):
         return get_fs_data_path_from_i3dio()
 
-    def execute(self, context):
-        all_inconsistencies = defaultdict(set)
-        materials_to_check = [mat for mat in bpy.data.materials if is_vehicle_shader(mat) and mat.users > 0]
+    def create_job(self, context):
+        from .batch import iter_rebuild_materials
+        from .report import Report
+        from .scheduler import TimeSlicedJob
+        from .utils import apply_uv_renames, get_material_user_index, plan_uv_standardization
 
+        materials_to_check = [mat for mat in bpy.data.materials if is_vehicle_shader(mat) and mat.users > 0]
+        index = get_material_user_index(context.scene)
+        renames, conflicts = plan_uv_standardization(materials_to_check, index)
+
+        for rename in conflicts:
+            self.report(
+                {"WARNING"},
+                f"Mesh {rename.mesh.name!r} already has a UV map named {rename.new_name!r}, "
+                f"skipped renaming {rename.old_name!r} at index {rename.uv_index}.",
+            )
+        if not renames:
+            self.report({"INFO"}, "No UV inconsistencies found." if not conflicts else "No UV maps renamed.")
+            return None
+
+        if self.dry_run:
+            details = ", ".join(f"{r.mesh.name}[{r.uv_index}] {r.old_name} -> {r.new_name}" for r in renames)
+            self.report({"INFO"}, f"Would rename {len(renames)} UV maps: {details}")
+            return None
+
+        # Only visualized materials that read a renamed layer through one of their UV nodes need a rebuild
+        renamed = {(r.mesh, r.uv_index) for r in renames}
+        affected = []
         for mat in materials_to_check:
-            material_inconsistencies = find_uv_inconsistencies(mat)
-            for uv_index, names in material_inconsistencies.items():
-                all_inconsistencies[uv_index].update(names)
-
-        if not all_inconsistencies:
-            self.report({"INFO"}, "No UV inconsistencies found.")
-            return {"FINISHED"}
+            if not mat.i3d_visualized:
+                continue
+            requirements = mat.i3d_attributes.required_vertex_attributes
+            uv_indices = [i for i in (1, 2) if f"uv{i}" in requirements]
+            if any((obj.data, i) in renamed for obj in index.users(mat) for i in uv_indices):
+                affected.append(mat)
+
+        apply_uv_renames(renames)
+        self._renamed = len(renames)
+        self._affected = affected
+        return TimeSlicedJob(iter_rebuild_materials(affected, Report(self)), len(affected), "Rebuilding")
+
+    def finish_job(self, context, job):
+        self.report({"INFO"}, f"Renamed {self._renamed} UV maps to standardize names, rebuilt {job.done} materials.")
+        rebuilt = set(job.completed)
+        if unbuilt := [mat.name for mat in self._affected if mat not in rebuilt]:
+            self.report(
+                {"WARNING"},
+                f"{len(unbuilt)} materials reading renamed UV maps were not rebuilt, run Visualize All to update "
+                f"them: {', '.join(unbuilt)}",
+            )
+
+
+class I3DMaterialVisualizer_OT_find_duplicates(bpy.types.Operator):
+    bl_idname = "i3d_material_visualizer.find_duplicates"
+    bl_label = "Find Duplicate Materials"
+    bl_description = "Find vehicleShader materials with identical I3D attributes, node trees and UV names"
+    bl_options = {"INTERNAL", "UNDO"}
 
-        master_names = {index: sorted(list(names))[0] for index, names in all_inconsistencies.items()}
-        rename_count = 0
-        user_objects = [obj for obj in context.scene.objects if obj.type == "MESH"]
+    merge: bpy.props.BoolProperty(
+        name="Merge",
+        description="Replace every duplicate with the first material of its group in all material slots",
+        default=False,
+        options={"HIDDEN"},
+    )
 
-        for obj in user_objects:
-            for uv_index in all_inconsistencies.keys():
-                if len(obj.data.uv_layers) > uv_index:
-                    uv_layer = obj.data.uv_layers[uv_index]
-                    master_name = master_names[uv_index]
+    def execute(self, context):
+        runtime.load()
+        from .dedup import find_duplicate_groups, merge_duplicates
+        from .masks import mask_controller
+        from .utils import get_material_user_index, invalidate_material_user_index
 
-                    # If this layer's name is one of the bad ones and not the chosen master name...
-                    if uv_layer.name in all_inconsistencies[uv_index] and uv_layer.name != master_name:
-                        uv_layer.name = master_name
-                        rename_count += 1
+        materials = sorted(
+            (mat for mat in bpy.data.materials if mat.users > 0 and is_vehicle_shader(mat)), key=lambda m: m.name
+        )
+        groups = find_duplicate_groups(materials, get_material_user_index(context.scene), exact=True)
+        if not groups:
+            self.report({"INFO"}, "No duplicate materials found.")
+            return {"FINISHED"}
 
-        for mat in materials_to_check:
-            if mat.i3d_visualized:
-                MaterialVisualizer.enable(mat)
+        details = "; ".join(f"{g.prototype.name}: {', '.join(m.name for m in g.duplicates)}" for g in groups)
+        duplicates = sum(len(g.duplicates) for g in groups)
+        if not self.merge:
+            self.report({"INFO"}, f"{duplicates} duplicates in {len(groups)} groups. {details}")
+            return {"FINISHED"}
 
-        self.report({"INFO"}, f"Renamed {rename_count} UV maps to standardize names.")
+        merged = merge_duplicates(groups)
+        invalidate_material_user_index()
+        mask_controller.invalidate()
+        self.report({"INFO"}, f"Merged {merged} duplicates into {len(groups)} materials. {details}")
         return {"FINISHED"}
 
 
 classes = (
     I3DMaterialVisualizer_OT_sync_shader,
+    I3DMaterialVisualizer_OT_sync_materials,
     I3DMaterialVisualizer_OT_copy_attributes,
     I3DMaterialVisualizer_OT_visualize_all,
     I3DMaterialVisualizer_OT_standardize_uvs,
+    I3DMaterialVisualizer_OT_find_duplicates,
 )
 
 register, unregister = bpy.utils.register_classes_factory(classes)
@@ -0,0 +1,147 @@
+import hashlib
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+from .graph_utils import parse_link_path
+from .specs import SPECS, NodeSpec, Vec2
+
+LAYOUT_COLLISION_STEP = 40  # vertical shift applied when two nodes resolve to the same location
+
+
+@dataclass(frozen=True)
+class PlannedLink:  # from_role.from_socket -> to_role.to_socket
+    from_role: str
+    from_socket: str
+    to_role: str
+    to_socket: str
+
+
+@dataclass(frozen=True)
+class PlannedNode:
+    role: str
+    spec: NodeSpec
+    anchor: str | None = None  # root of the anchor chain, None for absolute placement
+    offset: Vec2 | None = None  # location relative to `anchor` (absolute when anchor is None or missing)
+
+
+@dataclass(frozen=True)
+class BuildPlan:
+    nodes: tuple[PlannedNode, ...]
+    links: dict[str | None, tuple[PlannedLink, ...]]  # bucketed by Link.condition, None = unconditional
+    fingerprint: str = ""  # changes whenever the specs change, invalidating incremental rebuilds
+
+    def links_for(self, conditions: Iterable[str] = ()) -> Iterator[PlannedLink]:
+        """Yield unconditional links followed by the links of every active condition."""
+        yield from self.links.get(None, ())
+        for condition in conditions:
+            yield from self.links.get(condition, ())
+
+    def unused_roles(self, available_textures: set[str]) -> set[str]:
+        """
+        Roles a minimal graph leaves out: image nodes whose texture slot has no source and which have no default
+        image, then helpers all of whose `requires_any` roles are left out. `available_textures` holds the keys of
+        the slots that have a source.
+        """
+        unused = {
+            step.role
+            for step in self.nodes
+            if (image := step.spec.image) and image.key and not image.default and image.key not in available_textures
+        }
+        changed = True
+        while changed:
+            changed = False
+            for step in self.nodes:
+                requires = step.spec.requires_any
+                if requires and step.role not in unused and all(role in unused for role in requires):
+                    unused.add(step.role)
+                    changed = True
+        return unused
+
+
+def _topological_roles(specs: dict[str, NodeSpec]) -> list[str]:
+    """Order roles so that every layout anchor precedes the nodes placed relative to it."""
+    ordered: list[str] = []
+    visiting: set[str] = set()
+
+    def visit(role: str) -> None:
+        if role in ordered:
+            return
+        if role in visiting:
+            raise ValueError(f"Cyclic location_relative_to chain at {role!r}")
+        visiting.add(role)
+        anchor = specs[role].location_relative_to
+        if anchor in specs:
+            visit(anchor)
+        visiting.discard(role)
+        ordered.append(role)
+
+    for role in specs:
+        visit(role)
+    return ordered
+
+
+def _resolve_layout(specs: dict[str, NodeSpec], order: list[str]) -> dict[str, tuple[str | None, Vec2 | None]]:
+    """
+    Resolve every spec location to an offset from the root of its anchor chain. Collisions between nodes sharing
+    an anchor are resolved here; those between anchors, whose locations are only known per material, at build time.
+    """
+    resolved: dict[str, tuple[str | None, Vec2 | None]] = {}
+    occupied: set[tuple[str | None, Vec2]] = set()
+    for role in order:
+        spec = specs[role]
+        if not spec.location:
+            resolved[role] = (None, None)
+            continue
+        anchor, offset = None, spec.location
+        if spec.location_relative_to:
+            parent_anchor, parent_offset = resolved.get(spec.location_relative_to, (None, None))
+            if parent_offset is None:  # the anchor itself is never moved, so it is the root
+                anchor = spec.location_relative_to
+            else:
+                anchor = parent_anchor
+                offset = (parent_offset[0] + offset[0], parent_offset[1] + offset[1])
+        while (anchor, offset) in occupied:
+            offset = (offset[0], offset[1] - LAYOUT_COLLISION_STEP)
+        occupied.add((anchor, offset))
+        resolved[role] = (anchor, offset)
+    return resolved
+
+
+def _resolve_links(specs: dict[str, NodeSpec], order: list[str]) -> dict[str | None, tuple[PlannedLink, ...]]:
+    """Normalize links declared on either end into unique from -> to socket pairs. Malformed links raise."""
+    conditions: dict[PlannedLink, list[str | None]] = {}
+    for role in order:
+        spec = specs[role]
+        for link, is_from_node_link in [(lnk, True) for lnk in spec.from_node] + [(lnk, False) for lnk in spec.to_node]:
+            if not (parts := parse_link_path(link.path)):
+                raise ValueError(f"Invalid link path {link.path!r} on {role!r}")
+            this_sock, other_role, other_sock = parts
+            if other_role not in specs:
+                raise ValueError(f"Link {link.path!r} on {role!r} refers to unknown role {other_role!r}")
+            if is_from_node_link:
+                planned = PlannedLink(other_role, other_sock, role, this_sock)
+            else:
+                planned = PlannedLink(role, this_sock, other_role, other_sock)
+            declared = conditions.setdefault(planned, [])
+            if link.condition not in declared:
+                declared.append(link.condition)
+
+    buckets: dict[str | None, list[PlannedLink]] = {}
+    for planned, declared in conditions.items():
+        # Declared both with and without a condition: always link. Under several conditions: link under each
+        for condition in [None] if None in declared else declared:
+            buckets.setdefault(condition, []).append(planned)
+    return {condition: tuple(links) for condition, links in buckets.items()}
+
+
+def compile_plan(specs: dict[str, NodeSpec]) -> BuildPlan:
+    """Compile node specs into a flat, pre-resolved build plan."""
+    order = _topological_roles(specs)
+    layout = _resolve_layout(specs, order)
+    nodes = tuple(PlannedNode(role, specs[role], *layout[role]) for role in order)
+    links = _resolve_links(specs, order)
+    fingerprint = hashlib.sha1(repr((nodes, sorted(links.items(), key=repr))).encode()).hexdigest()
+    return BuildPlan(nodes=nodes, links=links, fingerprint=fingerprint)
+
+
+BUILD_PLAN = compile_plan(SPECS)
@@ -0,0 +1,71 @@
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import bpy
+
+from . import dds
+from .data_index import get_data_index
+from .proxies import generate_proxies
+from .specs import SPECS
+from .sync import prime_image_cache, resolve_image_file
+
+MAX_WORKERS = 8
+
+
+@dataclass(frozen=True)
+class TextureProbe:
+    image_path: str
+    filepath: str
+    error: str | None = None
+
+
+def collect_texture_paths(materials: Iterable[bpy.types.Material]) -> set[str]:
+    """Collect every image path the builder and texture sync will load for the given materials."""
+    image_specs = [spec.image for spec in SPECS.values() if spec.image]
+    paths = {img_spec.default for img_spec in image_specs if img_spec.default}
+    for mat in materials:
+        textures = mat.i3d_attributes.shader_material_textures
+        for img_spec in image_specs:
+            if img_spec.key and img_spec.key in textures:
+                slot = textures[img_spec.key]
+                if path := slot.source or slot.default_source:
+                    paths.add(path)
+    return paths
+
+
+def probe_texture(image_path: str, fs_data_path: str) -> TextureProbe:
+    """Resolve, stat and validate one texture. Runs on worker threads, so it must not touch bpy."""
+    filepath = resolve_image_file(image_path, fs_data_path)
+    try:
+        with open(filepath, "rb") as f:
+            if Path(filepath).suffix.lower() == ".dds":
+                dds.read_header(f)
+    except FileNotFoundError:
+        return TextureProbe(image_path, filepath, "missing")
+    except (OSError, ValueError) as e:
+        return TextureProbe(image_path, filepath, f"unreadable: {e}")
+    return TextureProbe(image_path, filepath)
+
+
+def prefetch_textures(
+    materials: Iterable[bpy.types.Material], fs_data_path: str, proxy_size: int | None = None
+) -> list[TextureProbe]:
+    """
+    Resolve and validate all textures needed by the materials on a thread pool, then seed the image cache
+    so only bpy image creation is left for the main thread. With proxy_size, the texture proxies are built
+    on the pool as well. Returns the probes of missing or corrupt files.
+    """
+    paths = sorted(collect_texture_paths(materials))
+    if not paths:
+        return []
+    index = get_data_index(fs_data_path)  # created here, as its cache location needs bpy
+    index.revalidate()  # notice files added or deleted since the last run
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(paths))) as pool:
+        probes = list(pool.map(lambda path: probe_texture(path, fs_data_path), paths))
+    prime_image_cache(fs_data_path, {probe.image_path: (probe.filepath, probe.error) for probe in probes})
+    index.save()
+    if proxy_size:
+        generate_proxies([probe.filepath for probe in probes if not probe.error], proxy_size)
+    return [probe for probe in probes if probe.error]
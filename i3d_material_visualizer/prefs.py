@@ -0,0 +1,35 @@
+import bpy
+
+from .constants import I3DIO_ADDON_ID
+
+
+def check_i3dio_enabled() -> bool:
+    return any(a.module.endswith(I3DIO_ADDON_ID) for a in bpy.context.preferences.addons.values())
+
+
+_fs_data_path_override: str | None = None
+
+
+def set_fs_data_path_override(path: str | None) -> None:
+    """Use this FS data path instead of the exporter preference, e.g. when run headless from the command line."""
+    global _fs_data_path_override
+    _fs_data_path_override = path
+
+
+def get_fs_data_path_from_i3dio() -> str | None:
+    if _fs_data_path_override:
+        return _fs_data_path_override
+    addon = next((a for a in bpy.context.preferences.addons.values() if a.module.endswith(I3DIO_ADDON_ID)), None)
+    return addon.preferences.fs_data_path if addon else None
+
+
+def shader_import_mode() -> str:
+    """LINK or APPEND, from the addon preferences (APPEND when the addon isn't enabled through preferences)."""
+    addon = bpy.context.preferences.addons.get(__package__)
+    return addon.preferences.shader_import_mode if addon else "APPEND"
+
+
+def build_budget_ms() -> int:
+    """Milliseconds of building per tick of a time-sliced bulk operation, from the addon preferences."""
+    addon = bpy.context.preferences.addons.get(__package__)
+    return addon.preferences.build_budget_ms if addon else 50
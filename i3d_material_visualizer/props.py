@@ -1,34 +1,53 @@
+from contextlib import contextmanager
+
 import bpy
 
-from .builder import MaterialVisualizer
-from .constants import VEHICLE_SHADER_GROUP_NAME
-from .sync import (
-    SyncDirection,
-    get_fs_data_path_from_i3dio,
-    sync_params,
-    sync_textures,
-)
-
-MASKS = {
-    "Scratches": "show_scratches",
-    "Dirt": "show_dirt",
-    "Snow": "show_snow",
-    "Wetness": "show_wetness",
-    "Wetness Mask": "show_wetness_mask",
-}
-
-
-def make_mask_updater(arg: str) -> callable:
-    def update_mask(self, context) -> None:
-        value = getattr(self, MASKS.get(arg, ""), False)
-        for mat in bpy.data.materials:
-            if mat.users == 0:
-                continue
-            if mat.i3d_attributes.shader_name == "vehicleShader":
-                if (node := mat.node_tree.nodes.get(VEHICLE_SHADER_GROUP_NAME)) and (sock := node.inputs.get(arg)):
-                    sock.default_value = value
-
-    return update_mask
+from . import runtime
+from .prefs import get_fs_data_path_from_i3dio
+
+
+def update_masks(self, context) -> None:
+    """Queue a batched write of all mask toggles; rapid toggles are coalesced by the mask controller."""
+    runtime.load()
+    from .masks import mask_controller
+
+    mask_controller.request(self.id_data)
+
+
+def _rebuild_visualized_materials(scene: bpy.types.Scene) -> None:
+    """Rebuild every visualized material after a setting that changes all their graphs, then write mask states."""
+    if not get_fs_data_path_from_i3dio():
+        return
+    runtime.load()
+    from .builder import BuildSession, MaterialVisualizer
+    from .masks import mask_controller
+    from .utils import is_vehicle_shader
+
+    session = BuildSession.create()
+    for mat in bpy.data.materials:
+        if mat.users and mat.i3d_visualized and is_vehicle_shader(mat):
+            MaterialVisualizer(mat, session=session).apply()
+    mask_controller.invalidate()
+    mask_controller.request(scene)
+
+
+def update_global_masks(self, context) -> None:
+    """Relink visualized materials to (or away from) the shared mask control group, then write mask states."""
+    _rebuild_visualized_materials(self.id_data)
+
+
+def update_minimal_graphs(self, context) -> None:
+    """Drop or restore the nodes of unset optional textures in every visualized material."""
+    _rebuild_visualized_materials(self.id_data)
+
+
+def update_texture_proxies(self, context) -> None:
+    """Add or remove the proxy texture nodes, then swap the visualizer textures to proxies of the chosen size."""
+    _rebuild_visualized_materials(self.id_data)
+    runtime.load()
+    from .proxies import proxy_settings, set_proxy_mode
+
+    set_proxy_mode(proxy_settings())
 
 
 class I3DMaterialVisualizerProperties(bpy.types.PropertyGroup):
@@ -38,35 +57,107 @@ class I3DMaterialVisualizerProperties(bpy.types.PropertyGroup):
         name="Show Wetness Mask",
         description="Show wetness mask in the viewport",
         default=False,
-        update=make_mask_updater("Wetness Mask"),
+        update=update_masks,
     )
 
     show_scratches: bpy.props.BoolProperty(
         name="Show Scratches",
         description="Show scratches in the viewport",
         default=False,
-        update=make_mask_updater("Scratches"),
+        update=update_masks,
     )
 
     show_dirt: bpy.props.BoolProperty(
         name="Show Dirt",
         description="Show dirt in the viewport",
         default=False,
-        update=make_mask_updater("Dirt"),
+        update=update_masks,
     )
 
     show_snow: bpy.props.BoolProperty(
         name="Show Snow",
         description="Show snow in the viewport",
         default=False,
-        update=make_mask_updater("Snow"),
+        update=update_masks,
     )
 
     show_wetness: bpy.props.BoolProperty(
         name="Show Wetness",
         description="Show wetness in the viewport",
         default=False,
-        update=make_mask_updater("Wetness"),
+        update=update_masks,
+    )
+
+    use_global_masks: bpy.props.BoolProperty(
+        name="Global Mask Controls",
+        description=(
+            "Drive the masks of all visualized materials from one shared node group, "
+            "so a toggle is a single write regardless of material count"
+        ),
+        default=False,
+        update=update_global_masks,
+    )
+
+    use_specialized_shaders: bpy.props.BoolProperty(
+        name="Specialized Shaders",
+        description=(
+            "Switch visualized materials to copies of the vehicle shader compiled for the current mask toggles, "
+            "with the branches of disabled masks removed, so shaders compile and render faster. "
+            "Not used with global mask controls"
+        ),
+        default=False,
+        update=update_masks,
+    )
+
+    minimal_graphs: bpy.props.BoolProperty(
+        name="Minimal Node Graphs",
+        description=(
+            "Leave out the nodes of optional textures that aren't set, such as the detail maps and their "
+            "mapping, so materials have fewer nodes and compile faster. They are added when a slot gets a source"
+        ),
+        default=False,
+        update=update_minimal_graphs,
+    )
+
+    purge_on_disable: bpy.props.BoolProperty(
+        name="Purge on Disable",
+        description=(
+            "Remove the visualizer nodes when disabling a material. Otherwise they are kept disconnected, "
+            "so visualizing it again only reconnects them"
+        ),
+        default=False,
+    )
+
+    deduplicate_builds: bpy.props.BoolProperty(
+        name="Deduplicate Builds",
+        description=(
+            "When visualizing all materials, build identical materials once and clone the node graph into the rest"
+        ),
+        default=False,
+    )
+
+    use_texture_proxies: bpy.props.BoolProperty(
+        name="Texture Proxies",
+        description=(
+            "Show downscaled copies of the DDS textures, made from their mip levels, to save memory in large "
+            "scenes. Saved files keep referencing the full resolution textures"
+        ),
+        default=False,
+        update=update_texture_proxies,
+    )
+
+    proxy_size: bpy.props.EnumProperty(
+        name="Proxy Size",
+        description="Largest edge length of the texture proxies",
+        items=[(str(size), f"{size} px", "") for size in (256, 512, 1024, 2048)],
+        default="512",
+        update=update_texture_proxies,
+    )
+
+    profile: bpy.props.BoolProperty(
+        name="Profile Builds",
+        description="Record per-phase timings and counters of visualizer builds and show the last run here",
+        default=False,
     )
 
     src_material: bpy.props.PointerProperty(
@@ -81,19 +172,82 @@ class I3DMaterialVisualizerProperties(bpy.types.PropertyGroup):
         type=bpy.types.Material,
     )
 
+    dst_collection: bpy.props.PointerProperty(
+        name="Destination Collection",
+        description="Collection whose materials receive the attributes when copying to a collection",
+        type=bpy.types.Collection,
+    )
+
+
+def update_shader_import_mode(self, context) -> None:
+    """Re-resolve the shader group on the next build, converting the current file to the new mode."""
+    runtime.load()
+    from .library import invalidate_shader_group
+
+    invalidate_shader_group()
+
+
+class I3DMaterialVisualizerPreferences(bpy.types.AddonPreferences):
+    bl_idname = __package__
+
+    shader_import_mode: bpy.props.EnumProperty(
+        name="Shader Import",
+        description="How the vehicle shader node group is brought into .blend files",
+        items=[
+            ("APPEND", "Append", "Store a local copy of the shader in every file, upgraded when the add-on updates"),
+            ("LINK", "Link", "Link the shader from the add-on's library, keeping files small"),
+        ],
+        default="APPEND",
+        update=update_shader_import_mode,
+    )
+    build_budget_ms: bpy.props.IntProperty(
+        name="Build Time Slice",
+        description=(
+            "Milliseconds of building per UI update when visualizing many materials. "
+            "Lower keeps the interface more responsive, higher finishes sooner"
+        ),
+        default=50,
+        min=5,
+        max=1000,
+    )
+
+    def draw(self, context):
+        self.layout.prop(self, "shader_import_mode")
+        self.layout.prop(self, "build_budget_ms")
 
-classes = (I3DMaterialVisualizerProperties,)
+
+classes = (I3DMaterialVisualizerProperties, I3DMaterialVisualizerPreferences)
 
 _register, _unregister = bpy.utils.register_classes_factory(classes)
 
 
+_visualize_updates_suspended = False
+
+
+@contextmanager
+def suspended_visualize_updates():
+    """Skip update_visualize_material while bulk operations set Material.i3d_visualized themselves."""
+    global _visualize_updates_suspended
+    previous, _visualize_updates_suspended = _visualize_updates_suspended, True
+    try:
+        yield
+    finally:
+        _visualize_updates_suspended = previous
+
+
 def update_visualize_material(self, context):
     """Callback for Material.i3d_visualized toggle."""
-    if not get_fs_data_path_from_i3dio():
+    if _visualize_updates_suspended or not get_fs_data_path_from_i3dio():
         return
 
+    runtime.load()
+    from .builder import MaterialVisualizer
+    from .masks import mask_controller
+    from .sync import SyncDirection, sync_params, sync_textures
+
     mat: bpy.types.Material = self.id_data
 
+    mask_controller.invalidate()
     if mat.i3d_visualized:
         # Build the node graph if missing
         MaterialVisualizer.enable(mat)
@@ -101,8 +255,8 @@ def update_visualize_material(self, context):
         sync_params(mat, SyncDirection.PROPS_TO_NODES)
         sync_textures(mat, SyncDirection.PROPS_TO_NODES)
     else:
-        # Remove the visualizer nodes and restore pre-existing output
-        MaterialVisualizer.disable(mat)
+        # Park or remove the visualizer nodes and restore pre-existing output
+        MaterialVisualizer.disable(mat, purge=context.scene.i3d_material.purge_on_disable)
 
 
 def register():
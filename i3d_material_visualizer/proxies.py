@@ -0,0 +1,219 @@
+import hashlib
+import os
+import tempfile
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import bpy
+
+from . import dds
+from .constants import AUTO_FLAG, PROXY_SOURCE_PROP
+from .report import count
+
+MAX_WORKERS = 8
+PROXY_NAME_SUFFIX = ".proxy"
+
+_proxies: dict[tuple[str, int], str | None] = {}  # (full resolution file, max size) -> proxy file, or None
+
+
+def proxy_settings() -> int | None:
+    """The proxy edge length set on the scene, or None when proxy mode is off."""
+    props = bpy.context.scene.i3d_material
+    return int(props.proxy_size) if props.use_texture_proxies else None
+
+
+def proxy_directory() -> Path:
+    try:
+        return Path(bpy.utils.extension_path_user(__package__, path="proxies", create=True))
+    except ValueError:  # installed as a legacy add-on, which has no user directory
+        directory = Path(tempfile.gettempdir()) / "i3d_material_visualizer_proxies"
+        directory.mkdir(exist_ok=True)
+        return directory
+
+
+def build_proxy(filepath: str, max_size: int, directory: Path) -> str | None:
+    """
+    Return a cached proxy of a DDS texture, writing it from the texture's lower mip levels if needed.
+    None if the texture needs no proxy or can't have one. Runs on worker threads, so it must not touch bpy.
+    """
+    if Path(filepath).suffix.lower() != ".dds":
+        return None
+    try:
+        st = os.stat(filepath)
+        key = f"{os.path.normcase(os.path.abspath(filepath))}|{st.st_size}|{st.st_mtime_ns}|{max_size}"
+        proxy = directory / f"{hashlib.sha1(key.encode()).hexdigest()[:20]}.dds"
+        if proxy.is_file() or dds.write_mip_tail(filepath, proxy, max_size):
+            return str(proxy)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def generate_proxies(filepaths: Iterable[str], max_size: int) -> dict[str, str | None]:
+    """Build the proxies of many textures on a thread pool. Returns full resolution file -> proxy file or None."""
+    todo = sorted({path for path in filepaths if (path, max_size) not in _proxies})
+    if todo:
+        directory = proxy_directory()
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(todo))) as pool:
+            proxies = pool.map(lambda path: build_proxy(path, max_size, directory), todo)
+            _proxies.update({(path, max_size): proxy for path, proxy in zip(todo, proxies)})
+    return {path: _proxies[(path, max_size)] for path in filepaths}
+
+
+def get_proxy(filepath: str, max_size: int) -> str | None:
+    if (filepath, max_size) not in _proxies:
+        _proxies[(filepath, max_size)] = build_proxy(filepath, max_size, proxy_directory())
+    return _proxies[(filepath, max_size)]
+
+
+def source_filepath(image: bpy.types.Image) -> str:
+    """The full resolution file of an image, also when a proxy is loaded in its place."""
+    return image.get(PROXY_SOURCE_PROP) or image.filepath
+
+
+def is_proxy(image: bpy.types.Image) -> bool:
+    return (source := image.get(PROXY_SOURCE_PROP)) is not None and image.filepath_raw != source
+
+
+def load_image(filepath: str, max_size: int | None = None) -> bpy.types.Image:
+    """
+    Load a texture, or its proxy when max_size is given and one can be built. The image stores the full
+    resolution path, which also marks it as loaded by the visualizer: only such images are ever swapped.
+    A proxy image keeps the texture's file name as its name.
+    """
+    proxy = get_proxy(filepath, max_size) if max_size else None
+    image = bpy.data.images.load(proxy or filepath)
+    image[PROXY_SOURCE_PROP] = filepath
+    if proxy:
+        image.name = Path(filepath).name
+        count("proxies loaded")
+    return image
+
+
+def _full_resolution_file(image: bpy.types.Image) -> str:
+    return bpy.path.abspath(source_filepath(image), library=image.library)
+
+
+def swap_image(image: bpy.types.Image, max_size: int | None) -> bool:
+    """
+    Point an image at its proxy (max_size) or back at its full resolution file. The full resolution path is kept
+    as it was written, relative paths included. Returns True if it changed.
+    """
+    source = image.get(PROXY_SOURCE_PROP) or image.filepath_raw
+    proxy = get_proxy(_full_resolution_file(image), max_size) if max_size else None
+    target = proxy or source
+    changed = image.filepath_raw != target
+    if changed:
+        image.filepath = target  # reloads the pixels
+    if image.get(PROXY_SOURCE_PROP) != source:
+        image[PROXY_SOURCE_PROP] = source
+    return changed
+
+
+def proxy_image(image: bpy.types.Image, max_size: int) -> bpy.types.Image:
+    """
+    A separate image showing the proxy of an image's file, for the visualizer's own nodes, so the image itself keeps
+    full resolution in the material's own nodes, which the exporter reads. The image itself if it has no proxy.
+    """
+    if image.source != "FILE" or is_proxy(image):
+        return image
+    filepath = _full_resolution_file(image)
+    if (proxy := get_proxy(filepath, max_size)) is None:
+        return image
+    name = f"{Path(filepath).name}{PROXY_NAME_SUFFIX}"
+    copy = bpy.data.images.get(name)
+    if copy is None or copy.library is not None or copy.get(PROXY_SOURCE_PROP) != filepath:
+        # Files of the same name in other directories get numbered names, found by a scan
+        copies = (
+            i
+            for i in bpy.data.images
+            if i.name.startswith(name) and i.get(PROXY_SOURCE_PROP) == filepath and not i.library
+        )
+        copy = next(copies, None)
+    if copy is None:
+        copy = bpy.data.images.load(proxy)
+        copy.name = name
+        copy[PROXY_SOURCE_PROP] = filepath
+        count("proxies loaded")
+    else:
+        swap_image(copy, max_size)
+    if copy.colorspace_settings.name != image.colorspace_settings.name:
+        copy.colorspace_settings.name = image.colorspace_settings.name
+    if copy.alpha_mode != image.alpha_mode:
+        copy.alpha_mode = image.alpha_mode
+    return copy
+
+
+def exported_images() -> set[bpy.types.Image]:
+    """Images shown by the material's own nodes rather than visualizer-created ones, which the exporter reads."""
+    images = set()
+    for mat in bpy.data.materials:
+        if mat.node_tree is None:
+            continue
+        for node in mat.node_tree.nodes:
+            if not node.get(AUTO_FLAG) and (image := getattr(node, "image", None)):
+                images.add(image)
+    return images
+
+
+def set_proxy_mode(max_size: int | None) -> int:
+    """
+    Swap every image the visualizer loaded to proxies of max_size, or to full resolution for None. Images the
+    material's own nodes show always get full resolution; the builds show theirs through proxy_image() copies.
+    Unused images, e.g. the copies of a previous proxy mode, are left alone. Returns the number of swaps made.
+    """
+    images = [
+        image for image in bpy.data.images if PROXY_SOURCE_PROP in image and image.source == "FILE" and image.users
+    ]
+    exported = exported_images()
+    sizes = {image: None if image in exported else max_size for image in images}
+    if max_size:
+        generate_proxies([_full_resolution_file(image) for image, size in sizes.items() if size], max_size)
+    return sum(swap_image(image, size) for image, size in sizes.items())
+
+
+_saved_proxy_paths: dict[bpy.types.Image, str] = {}
+
+
+# Saved files reference the full resolution textures, so they open anywhere and export correctly. Changing only
+# filepath_raw around the save keeps the loaded proxy pixels.
+@bpy.app.handlers.persistent
+def _store_full_resolution_paths(*_args) -> None:
+    for image in bpy.data.images:
+        if is_proxy(image):
+            _saved_proxy_paths[image] = image.filepath_raw
+            image.filepath_raw = image[PROXY_SOURCE_PROP]
+
+
+@bpy.app.handlers.persistent
+def _restore_proxy_paths(*_args) -> None:
+    for image, proxy in _saved_proxy_paths.items():
+        image.filepath_raw = proxy
+    _saved_proxy_paths.clear()
+
+
+@bpy.app.handlers.persistent
+def _reapply_proxies_on_load(*_args) -> None:
+    _proxies.clear()
+    set_proxy_mode(proxy_settings())
+
+
+_HANDLERS = (
+    (bpy.app.handlers.save_pre, _store_full_resolution_paths),
+    (bpy.app.handlers.save_post, _restore_proxy_paths),
+    (bpy.app.handlers.load_post, _reapply_proxies_on_load),
+)
+
+
+def register():
+    for handlers, handler in _HANDLERS:
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister():
+    for handlers, handler in _HANDLERS:
+        if handler in handlers:
+            handlers.remove(handler)
+    _proxies.clear()
@@ -0,0 +1,106 @@
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import bpy
+
+_active: list["Report"] = []  # reports currently collecting counters, innermost last
+_last_profile: dict | None = None
+
+SLOWEST_MATERIALS = 20  # per-material rows kept in a bulk report's dict, slowest first
+
+
+class Report:
+    """
+    Collects warnings and, when profiling, per-phase timings and counters of a build or bulk operation.
+    Counters raised through the module-level `count` go to the innermost activated report.
+    """
+
+    def __init__(self, operator: bpy.types.Operator | None = None, profile: bool = False):
+        self.operator = operator
+        self.profile = profile
+        self.warnings: list[str] = []
+        self.timings: dict[str, float] = defaultdict(float)  # phase -> seconds
+        self.material_timings: dict[str, float] = defaultdict(float)  # per-material phases, summed by merge()
+        self.material_rows: dict[str, dict[str, float]] = {}  # material -> its phase timings, recorded by merge()
+        self.counters: Counter[str] = Counter()
+
+    def warn(self, msg: str) -> None:
+        self.warnings.append(msg)
+        if self.operator:
+            self.operator.report({"WARNING"}, msg)
+        else:
+            print(f"MaterialVisualizer: WARNING: {msg}")
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.profile:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.profile:
+            self.counters[name] += n
+
+    @contextmanager
+    def activate(self):
+        """Route module-level `count` calls to this report while the block runs."""
+        _active.append(self)
+        try:
+            yield self
+        finally:
+            _active.remove(self)
+
+    def merge(self, other: "Report", material: str | None = None) -> None:
+        """
+        Fold the timings and counters of a per-material report into this bulk report. With the material's name,
+        its timings are also kept as a row of their own.
+        """
+        for name, seconds in other.timings.items():
+            self.material_timings[name] += seconds
+        if material is not None and other.timings:
+            self.material_rows[material] = dict(other.timings)
+        self.counters.update(other.counters)
+        self.warnings.extend(other.warnings)
+
+    def slowest_materials(self, n: int = SLOWEST_MATERIALS) -> list[dict]:
+        """The n slowest materials merged into this report, with their total and per-phase timings."""
+        rows = sorted(self.material_rows.items(), key=lambda row: sum(row[1].values()), reverse=True)[:n]
+        return [{"material": name, "total": sum(timings.values()), "timings": timings} for name, timings in rows]
+
+    def as_dict(self) -> dict:
+        return {
+            "timings": dict(self.timings),
+            "material_timings": dict(self.material_timings),
+            "materials": self.slowest_materials(),
+            "counters": dict(self.counters),
+            "warnings": list(self.warnings),
+        }
+
+    def summary(self) -> str:
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.timings.items())
+        counters = ", ".join(f"{name} {n}" for name, n in self.counters.items())
+        return f"{sum(self.timings.values()):.2f}s ({phases}){'; ' + counters if counters else ''}"
+
+
+def count(name: str, n: int = 1) -> None:
+    """Increment a counter on the active report, if any. Cheap no-op when nothing is being profiled."""
+    if _active:
+        _active[-1].count(name, n)
+
+
+def publish_profile(report: Report, label: str) -> None:
+    """Keep the profile of the last build or bulk run for the panel and for scripts."""
+    global _last_profile
+    if report.profile:
+        _last_profile = {"label": label, **report.as_dict()}
+
+
+def last_profile() -> dict | None:
+    """The profile of the last build or bulk operation, as a dict (None until something was profiled)."""
+    return _last_profile
@@ -0,0 +1,22 @@
+import importlib
+
+# Modules holding session caches, in registration order. They register the handlers that keep those caches
+# valid, and are only imported the first time the visualizer is actually used.
+RUNTIME_MODULES = ("utils", "data_index", "proxies", "sync", "library", "masks")
+
+_loaded: list = []
+
+
+def load() -> None:
+    """Import the builder and sync machinery and register its handlers. Cheap after the first call."""
+    if _loaded:
+        return
+    for name in RUNTIME_MODULES:
+        module = importlib.import_module(f".{name}", __package__)
+        module.register()
+        _loaded.append(module)
+
+
+def unregister() -> None:
+    while _loaded:
+        _loaded.pop().unregister()
@@ -0,0 +1,42 @@
+import time
+from collections.abc import Iterable
+
+TICK_INTERVAL = 0.01  # seconds between ticks, in which the UI redraws and handles input
+
+
+class TimeSlicedJob:
+    """
+    Work split into units by an iterable, typically a generator yielding once per material, run a time budget at
+    a time. Stopping between units is always safe, so a job can be cancelled between any two ticks.
+    """
+
+    def __init__(self, steps: Iterable, total: int, label: str):
+        self._steps = iter(steps)
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.completed: list = []  # units yielded so far, e.g. the materials built before a cancel
+        self.finished = False
+
+    def run(self, budget_ms: float | None = None) -> bool:
+        """
+        Run units until the budget is spent, at least one per call, or all of them without a budget.
+        Returns True once the job has finished.
+        """
+        deadline = None if budget_ms is None else time.perf_counter() + budget_ms / 1000
+        for unit in self._steps:
+            self.completed.append(unit)
+            self.done += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+        self.finished = True
+        return True
+
+    def cancel(self) -> None:
+        """Stop between units, running the generator's cleanup."""
+        if hasattr(self._steps, "close"):
+            self._steps.close()
+
+    @property
+    def status(self) -> str:
+        return f"{self.label}: {self.done}/{self.total} materials (Esc to cancel)"
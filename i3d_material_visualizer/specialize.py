@@ -0,0 +1,212 @@
+import bpy
+
+from .constants import SHADER_HASH_PROP, VARIANT_PROP, VEHICLE_SHADER_GROUP_NAME
+from .library import get_shader_group, library_hash
+
+# Math operations folded when all their inputs are constant
+_MATH_OPS = {
+    "ADD": lambda a, b: a + b,
+    "SUBTRACT": lambda a, b: a - b,
+    "MULTIPLY": lambda a, b: a * b,
+    "MINIMUM": min,
+    "MAXIMUM": max,
+}
+_KEPT_NODES = {"NodeFrame", "NodeGroupInput", "NodeGroupOutput"}
+
+
+def _constant_for(sock: bpy.types.NodeSocket, value: float) -> object | None:
+    """A scalar as the default value of a socket, broadcast to vectors and colors. None if it can't hold one."""
+    if sock.type in ("VALUE", "INT", "BOOLEAN"):
+        return value
+    if sock.type == "VECTOR":
+        return (value,) * len(sock.default_value)
+    if sock.type == "RGBA":
+        return (value, value, value, 1.0)
+    return None
+
+
+def _accepts_constant(link: bpy.types.NodeLink) -> bool:
+    # Unlinked group outputs and reroutes don't pass a default value on
+    if link.to_node.bl_idname in ("NodeGroupOutput", "NodeReroute"):
+        return False
+    return hasattr(link.to_socket, "default_value")
+
+
+def _replace_with_constant(tree: bpy.types.NodeTree, output: bpy.types.NodeSocket, value: float) -> bool:
+    """Unlink everything fed by an output whose value is known, writing the value into the inputs instead."""
+    links = list(output.links)
+    if not all(_accepts_constant(link) and _constant_for(link.to_socket, value) is not None for link in links):
+        return False
+    for link in links:
+        sock = link.to_socket
+        tree.links.remove(link)
+        sock.default_value = _constant_for(sock, value)
+    return True
+
+
+def _bypass(tree: bpy.types.NodeTree, node: bpy.types.Node, source: bpy.types.NodeSocket, output) -> bool:
+    """
+    Replace a node by one of its inputs: relink what feeds `source` to everything `output` feeds, or copy the
+    unlinked input's value into those sockets. Skipped when that would change implicit type conversions.
+    """
+    links = list(output.links)
+    if source.is_linked:
+        upstream = source.links[0].from_socket
+        if upstream.type != source.type and any(link.to_socket.type != source.type for link in links):
+            return False
+        for link in links:
+            sock = link.to_socket
+            tree.links.remove(link)
+            tree.links.new(upstream, sock)
+    else:
+        if not all(_accepts_constant(link) and link.to_socket.type == source.type for link in links):
+            return False
+        value = source.default_value
+        value = tuple(value) if hasattr(value, "__len__") else value
+        for link in links:
+            sock = link.to_socket
+            tree.links.remove(link)
+            sock.default_value = value
+    tree.nodes.remove(node)
+    return True
+
+
+def _mix_sockets(node: bpy.types.Node):
+    """Factor, A and B inputs and the result output of a mix node, as enabled for its data type."""
+    if node.bl_idname == "ShaderNodeMix":
+        enabled = [s for s in node.inputs if s.enabled]
+        pick = {s.name: s for s in reversed(enabled)}  # first enabled socket of each name
+        result = next((s for s in node.outputs if s.enabled), None)
+        return pick.get("Factor"), pick.get("A"), pick.get("B"), result
+    return node.inputs[0], node.inputs[1], node.inputs[2], node.outputs[0]
+
+
+def _clamps(node: bpy.types.Node) -> bool:
+    if node.bl_idname == "ShaderNodeMixShader":
+        return False
+    return node.clamp_result if node.bl_idname == "ShaderNodeMix" else node.use_clamp
+
+
+def _is_linear_mix(node: bpy.types.Node) -> bool:
+    """Whether a factor of 1 yields B unchanged: true for plain mixes, not for color blend modes."""
+    if node.bl_idname == "ShaderNodeMixShader":
+        return True
+    if node.bl_idname == "ShaderNodeMix" and node.data_type != "RGBA":
+        return True
+    return node.blend_type == "MIX"
+
+
+def _fold_mix(tree: bpy.types.NodeTree, node: bpy.types.Node) -> bool:
+    factor, a, b, result = _mix_sockets(node)
+    if factor is None or factor.is_linked or not isinstance(factor.default_value, float) or result is None:
+        return False
+    if _clamps(node):
+        return False
+    if factor.default_value == 0.0:
+        return _bypass(tree, node, a, result)
+    if factor.default_value == 1.0 and _is_linear_mix(node):
+        return _bypass(tree, node, b, result)
+    return False
+
+
+def _fold_math(tree: bpy.types.NodeTree, node: bpy.types.Node) -> bool:
+    if node.operation not in _MATH_OPS:
+        return False
+    a, b = node.inputs[0], node.inputs[1]
+    if not (a.is_linked or b.is_linked):
+        value = _MATH_OPS[node.operation](a.default_value, b.default_value)
+        if node.use_clamp:
+            value = min(max(value, 0.0), 1.0)
+        return _replace_with_constant(tree, node.outputs[0], value) and _remove(tree, node)
+    if node.operation != "MULTIPLY":
+        return False
+    constant, other = (a, b) if not a.is_linked else (b, a)
+    if constant.is_linked:
+        return False
+    if constant.default_value == 0.0:
+        return _replace_with_constant(tree, node.outputs[0], 0.0) and _remove(tree, node)
+    if constant.default_value == 1.0 and not node.use_clamp:
+        return _bypass(tree, node, other, node.outputs[0])
+    return False
+
+
+def _remove(tree: bpy.types.NodeTree, node: bpy.types.Node) -> bool:
+    tree.nodes.remove(node)
+    return True
+
+
+def _remove_dead_nodes(tree: bpy.types.NodeTree) -> int:
+    """Remove every node that no group or shader output depends on. Returns the number removed."""
+    feeders: dict[str, set[str]] = {}
+    for link in tree.links:
+        feeders.setdefault(link.to_node.name, set()).add(link.from_node.name)
+    alive: set[str] = set()
+    roots = [n for n in tree.nodes if n.bl_idname in _KEPT_NODES or n.bl_idname.startswith("ShaderNodeOutput")]
+    stack = [n.name for n in roots]
+    while stack:
+        name = stack.pop()
+        if name not in alive:
+            alive.add(name)
+            stack.extend(feeders.get(name, ()))
+    dead = [n for n in tree.nodes if n.name not in alive]
+    for node in dead:
+        tree.nodes.remove(node)
+    return len(dead)
+
+
+def specialize_group(tree: bpy.types.NodeTree, constants: dict[str, float]) -> int:
+    """
+    Compile group inputs with known values into a group: their links are replaced by the values, then mixes with
+    a constant 0 or 1 factor are bypassed, constant math is folded and nodes nothing depends on any more are
+    removed, until nothing changes. Nested groups are left alone. Returns the number of nodes removed.
+    """
+    before = len(tree.nodes)
+    for link in list(tree.links):
+        if link.from_node.bl_idname == "NodeGroupInput" and link.from_socket.name in constants:
+            if _accepts_constant(link) and _constant_for(link.to_socket, 0.0) is not None:
+                sock, value = link.to_socket, constants[link.from_socket.name]
+                tree.links.remove(link)
+                sock.default_value = _constant_for(sock, value)
+
+    changed = True
+    while changed:
+        changed = False
+        for node in list(tree.nodes):
+            if node.bl_idname in ("ShaderNodeMix", "ShaderNodeMixRGB", "ShaderNodeMixShader"):
+                changed |= _fold_mix(tree, node)
+            elif node.bl_idname == "ShaderNodeMath":
+                changed |= _fold_math(tree, node)
+        changed |= _remove_dead_nodes(tree) > 0
+    return before - len(tree.nodes)
+
+
+def variant_name(states: dict[str, bool]) -> str:
+    return f"{VEHICLE_SHADER_GROUP_NAME}_masks_{''.join('1' if on else '0' for on in states.values())}"
+
+
+def shader_variant(states: dict[str, bool]) -> bpy.types.NodeTree | None:
+    """
+    The vehicle shader group specialized for one combination of mask toggles (group input name -> on), with the
+    branches of the masks that are off pruned. Generated on first use and stored in the file, and regenerated
+    when the bundled shader changes. Unused variants have no users, so Blender drops them on save.
+    """
+    base = get_shader_group()
+    if base is None:
+        return None
+    name = variant_name(states)
+    stamp = f"{library_hash()}:{name}"
+    existing = bpy.data.node_groups.get(name)
+    if existing is not None and existing.library is None and existing.get(VARIANT_PROP) == stamp:
+        return existing
+
+    variant = base.copy()
+    variant.use_fake_user = False
+    if SHADER_HASH_PROP in variant:
+        del variant[SHADER_HASH_PROP]  # so the library never takes a variant for the shader itself
+    variant[VARIANT_PROP] = stamp
+    specialize_group(variant, {mask: float(on) for mask, on in states.items()})
+    if existing is not None:
+        existing.user_remap(variant)
+        bpy.data.node_groups.remove(existing)
+    variant.name = name
+    return variant
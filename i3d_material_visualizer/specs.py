@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 
-from .constants import VEHICLE_SHADER_GROUP_NAME
+from .constants import MASK_CONTROL_GROUP_NAME, VEHICLE_SHADER_GROUP_NAME
 
 Vec2 = tuple[int, int]
 
@@ -36,6 +36,9 @@ class NodeSpec:
     set_active_output: bool = False
     image: ImageSpec | None = None
     only_if_adopted: bool = False
+    condition: str | None = None  # only create the node if condition is active, remove it otherwise
+    requires_any: tuple[str, ...] = ()  # in minimal graphs, only create the node if one of these roles is built
+    proxy_of: str | None = None  # shows a texture proxy of this role's image, which keeps full resolution
 
 
 SPECS: dict[str, NodeSpec] = {
@@ -74,6 +77,22 @@ SPECS: dict[str, NodeSpec] = {
         from_node=[Link("Surface.FS25_VehicleShader.BSDF")],
         set_active_output=True,
     ),
+    "Mask Controls": NodeSpec(
+        role="Mask Controls",
+        bl_idname="ShaderNodeGroup",
+        group=MASK_CONTROL_GROUP_NAME,
+        location_relative_to="FS25_VehicleShader",
+        location=(260, -200),
+        to_node=[
+            Link("Scratches.FS25_VehicleShader.Scratches", from_node=False),
+            Link("Dirt.FS25_VehicleShader.Dirt", from_node=False),
+            Link("Snow.FS25_VehicleShader.Snow", from_node=False),
+            Link("Wetness.FS25_VehicleShader.Wetness", from_node=False),
+            Link("Wetness Mask.FS25_VehicleShader.Wetness Mask", from_node=False),
+        ],
+        collapsed=True,
+        condition="global_masks",
+    ),
     "Glossmap": NodeSpec(
         role="Glossmap",
         bl_idname="ShaderNodeSeparateColor",
@@ -90,8 +109,8 @@ SPECS: dict[str, NodeSpec] = {
         location=(-420, 80),
         to_node=[
             Link("Color.Principled BSDF.Base Color", from_node=False),
-            Link("Color.FS25_VehicleShader.Diffuse", from_node=False),
-            Link("Alpha.FS25_VehicleShader.Alpha", from_node=False),
+            Link("Color.FS25_VehicleShader.Diffuse", from_node=False, condition="full_resolution_textures"),
+            Link("Alpha.FS25_VehicleShader.Alpha", from_node=False, condition="full_resolution_textures"),
         ],
         from_node=[Link("Vector.uv_diff.UV")],
         image=ImageSpec(
@@ -108,7 +127,7 @@ SPECS: dict[str, NodeSpec] = {
         location=(-420, -480),
         to_node=[
             Link("Color.Glossmap.Color", from_node=False, condition="glossmap_exists"),
-            Link("Color.FS25_VehicleShader.Specular", from_node=False),
+            Link("Color.FS25_VehicleShader.Specular", from_node=False, condition="full_resolution_textures"),
         ],
         from_node=[Link("Vector.uv_spec.UV")],
         image=ImageSpec(
@@ -134,7 +153,7 @@ SPECS: dict[str, NodeSpec] = {
         location=(-420, -200),
         to_node=[
             Link("Color.Normal Map.Color", from_node=False),
-            Link("Color.FS25_VehicleShader.Normal", from_node=False),
+            Link("Color.FS25_VehicleShader.Normal", from_node=False, condition="full_resolution_textures"),
         ],
         from_node=[Link("Vector.uv_norm.UV")],
         image=ImageSpec(
@@ -144,6 +163,43 @@ SPECS: dict[str, NodeSpec] = {
             optional=False,
         ),
     ),
+    # --- Texture proxies: the material's own texture nodes keep full resolution for the exporter ---
+    "Diffuse Proxy": NodeSpec(
+        role="Diffuse Proxy",
+        bl_idname="ShaderNodeTexImage",
+        location_relative_to="FS25_VehicleShader",
+        location=(-240, 240),
+        to_node=[
+            Link("Color.FS25_VehicleShader.Diffuse", from_node=False),
+            Link("Alpha.FS25_VehicleShader.Alpha", from_node=False),
+        ],
+        from_node=[Link("Vector.uv_diff.UV")],
+        collapsed=True,
+        condition="texture_proxies",
+        proxy_of="Diffuse",
+    ),
+    "Specular Proxy": NodeSpec(
+        role="Specular Proxy",
+        bl_idname="ShaderNodeTexImage",
+        location_relative_to="FS25_VehicleShader",
+        location=(-240, 200),
+        to_node=[Link("Color.FS25_VehicleShader.Specular", from_node=False)],
+        from_node=[Link("Vector.uv_spec.UV")],
+        collapsed=True,
+        condition="texture_proxies",
+        proxy_of="Specular",
+    ),
+    "Normal Proxy": NodeSpec(
+        role="Normal Proxy",
+        bl_idname="ShaderNodeTexImage",
+        location_relative_to="FS25_VehicleShader",
+        location=(-240, 160),
+        to_node=[Link("Color.FS25_VehicleShader.Normal", from_node=False)],
+        from_node=[Link("Vector.uv_norm.UV")],
+        collapsed=True,
+        condition="texture_proxies",
+        proxy_of="Normal",
+    ),
     "Lights Intensity": NodeSpec(
         role="Lights Intensity",
         bl_idname="ShaderNodeTexImage",
@@ -192,6 +248,7 @@ SPECS: dict[str, NodeSpec] = {
         location_relative_to="Principled BSDF",
         location=(-840, -960),
         hide_unused=True,
+        requires_any=("detail_mapping",),
     ),
     "detail_mapping": NodeSpec(
         role="detail_mapping",
@@ -201,6 +258,7 @@ SPECS: dict[str, NodeSpec] = {
         from_node=[Link("Vector.texcoord.Object")],
         to_node=[Link("Vector.FS25_VehicleShader.Generated UV", from_node=False)],
         inputs_defaults={"Scale": (3.0, 3.0, 3.0)},
+        requires_any=("Detail Diffuse", "Detail Specular", "Detail Normal"),
     ),
     "Detail Diffuse": NodeSpec(
         role="Detail Diffuse",
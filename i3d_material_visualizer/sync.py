@@ -1,9 +1,16 @@
+import os
+from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
 
 import bpy
 
-from .constants import I3DIO_ADDON_ID, VEHICLE_SHADER_GROUP_NAME
+from .constants import AUTO_FLAG, VEHICLE_SHADER_GROUP_NAME
+from .data_index import get_data_index
+from .graph_utils import TreeIndex, values_equal
+from .prefs import get_fs_data_path_from_i3dio
+from .proxies import is_proxy, load_image, proxy_settings, source_filepath, swap_image
+from .report import count
 from .specs import SPECS
 
 
@@ -22,19 +29,10 @@ ATTR_MAP: dict[str, tuple[str, str]] = {
 }
 
 
-def check_i3dio_enabled() -> bool:
-    return any(a.module.endswith(I3DIO_ADDON_ID) for a in bpy.context.preferences.addons.values())
-
-
-def get_fs_data_path_from_i3dio() -> str | None:
-    addon = next((a for a in bpy.context.preferences.addons.values() if a.module.endswith(I3DIO_ADDON_ID)), None)
-    return addon.preferences.fs_data_path if addon else None
-
-
-def get_file_from_data(file_path):
+def get_file_from_data(file_path, fs_data_path: str | None = None):
     s = str(file_path)
     if s.startswith("$data"):
-        return Path(get_fs_data_path_from_i3dio()) / s[6:]
+        return Path(fs_data_path or get_fs_data_path_from_i3dio()) / s[6:]
     return Path(s)
 
 
@@ -52,35 +50,172 @@ def get_data_path_from_file(file_path: str | Path) -> str | None:
     return f"$data/{relative.as_posix()}"
 
 
+def _png_fallback(path: str) -> tuple[str, ...]:
+    """FS references textures as .png and ships them as .dds, so a missing .png is looked up as .dds."""
+    return (".dds",) if path.lower().endswith(".png") else ()
+
+
 def is_same_asset(path1: str, path2: str) -> bool:
-    """Check if two file paths point to the same asset in the FS data directory."""
+    """
+    Check if two file paths point to the same asset in the FS data directory, e.g. the .png and .dds of a texture.
+    `$data` paths of existing files are compared through the data index, case-insensitively.
+    """
+    fs_data_path = get_fs_data_path_from_i3dio()
+    if fs_data_path and path1.startswith("$data") and path2.startswith("$data"):
+        index = get_data_index(fs_data_path)
+        key1 = index.asset_key(path1[6:], _png_fallback(path1))
+        key2 = index.asset_key(path2[6:], _png_fallback(path2))
+        if key1 is not None and key2 is not None:
+            return key1 == key2
     pa1, pa2 = Path(path1), Path(path2)
     return pa1.parent.as_posix().lower() == pa2.parent.as_posix().lower() and pa1.stem.lower() == pa2.stem.lower()
 
 
+@dataclass
+class _ResolvedImage:
+    filepath: str  # absolute file the $data path resolved to
+    image: bpy.types.Image | None = None
+    error: str | None = None  # set by prefetch for missing or corrupt files, which are then not loaded
+    error_stat: tuple[int, int] | None = None  # the file's size and mtime when the error was found, if it existed
+
+
+def _file_stat(filepath: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class ImageResolutionCache:
+    """Maps image paths (as stored in material slots and specs) to resolved files and loaded images."""
+
+    def __init__(self):
+        self.entries: dict[str, _ResolvedImage] = {}
+        self.fs_data_path: str | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, fs_data_path: str | None) -> None:
+        """Drop every entry when the FS data path they were resolved against changes."""
+        if fs_data_path != self.fs_data_path:
+            self.entries.clear()
+            self.fs_data_path = fs_data_path
+
+    def lookup(self, image_path: str) -> _ResolvedImage | None:
+        entry = self.entries.get(image_path)
+        if entry is not None and entry.image is not None:
+            try:
+                entry.image.name  # raises once the image was removed from bpy.data
+            except ReferenceError:
+                entry.image = None
+        if entry is not None and entry.image is not None:
+            self.hits += 1
+            count("image cache hits")
+        else:
+            self.misses += 1
+            count("image cache misses")
+        return entry
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+_image_cache = ImageResolutionCache()
+
+
+def image_cache_stats() -> dict[str, int]:
+    return _image_cache.stats()
+
+
+def clear_image_cache() -> None:
+    _image_cache.clear()
+
+
+def prime_image_cache(fs_data_path: str | None, resolved: dict[str, tuple[str, str | None]]) -> None:
+    """
+    Seed the cache with paths resolved off the main thread (image path -> (file, error)). Entries without a
+    loaded image are replaced, so a bulk run retries the textures that failed before.
+    """
+    _image_cache.bind(fs_data_path)
+    entries = _image_cache.entries
+    for image_path, (filepath, error) in resolved.items():
+        if (entry := entries.get(image_path)) is None or entry.image is None:
+            error_stat = _file_stat(filepath) if error else None
+            entries[image_path] = _ResolvedImage(filepath, error=error, error_stat=error_stat)
+
+
+def resolve_image_file(image_path: str, fs_data_path: str | None) -> str:
+    """
+    Resolve an image path to a file on disk, falling back from .png to .dds. `$data` paths are answered from
+    the data index, case-insensitively; only a miss there goes to the disk. No bpy access if fs_data_path.
+    """
+    fs_data_path = fs_data_path or get_fs_data_path_from_i3dio()
+    if image_path.startswith("$data") and fs_data_path:
+        if found := get_data_index(fs_data_path).lookup(image_path[6:], _png_fallback(image_path)):
+            return found.filepath
+    fs_image_path = get_file_from_data(image_path, fs_data_path)
+    if not fs_image_path.exists():
+        fs_image_path = get_file_from_data(image_path.replace(".png", ".dds"), fs_data_path)
+    return str(fs_image_path)
+
+
 def load_custom_image(image_path: str) -> bpy.types.Image | None:
     if image_path == "":
         return None
+    _image_cache.bind(get_fs_data_path_from_i3dio())
+    entry = _image_cache.lookup(image_path)
+    if entry is not None and entry.image is not None:
+        return entry.image
+
     image = bpy.data.images.get(str(Path(image_path).name))
     if image is None:
         image = bpy.data.images.get(str(Path(image_path).with_suffix(".dds").name))
     if image is None:
-        fs_image_path = get_file_from_data(image_path)
-        if not fs_image_path.exists():
-            fs_image_path = image_path.replace(".png", ".dds")
-        image = bpy.data.images.load(str(get_file_from_data(fs_image_path)))
+        if entry is not None and entry.error:
+            if _file_stat(entry.filepath) == entry.error_stat:
+                return None
+            entry = None  # the file was added or changed since it failed, try again
+        if entry is None:  # only stat the disk the first time this path is seen
+            entry = _ResolvedImage(resolve_image_file(image_path, _image_cache.fs_data_path))
+        try:
+            image = load_image(entry.filepath, proxy_settings())
+        except RuntimeError as e:  # missing or unreadable, remembered until the file changes
+            entry.error, entry.error_stat = str(e), _file_stat(entry.filepath)
+            _image_cache.entries[image_path] = entry
+            print(f"I3D_Material_Visualizer: Could not load image {image_path!r}: {e}")
+            return None
+        count("image loads")
+    if entry is None:
+        entry = _ResolvedImage(image.filepath)
+    entry.image = image
+    _image_cache.entries[image_path] = entry
     return image
 
 
-def set_image(image: bpy.types.Image | None, image_node, color_space="Color"):
+def set_image(image: bpy.types.Image | None, image_node, color_space="Color") -> bool:
+    """Assign image and colorspace to a TexImage node, writing only what differs. Returns True on any write."""
+    changed = False
     try:
-        image_node.image = image
-
-        if color_space == "Non-Color" and image_node.image:
+        if image is not None and not image_node.get(AUTO_FLAG) and is_proxy(image):
+            swap_image(image, None)  # the material's own nodes are exported, so they keep full resolution
+        if image_node.image != image:
+            image_node.image = image
+            count("rna writes")
+            changed = True
+
+        if color_space == "Non-Color" and image_node.image and image_node.image.colorspace_settings.name != color_space:
             image_node.image.colorspace_settings.name = "Non-Color"
+            count("rna writes")
+            changed = True
 
     except RuntimeError:
         print(f"I3D_Material_Visualizer: Could not load image for node {getattr(image_node, 'name', '?')}")
+    return changed
 
 
 # --------------------------------------------------------------------------------------
@@ -93,31 +228,41 @@ def _get_vehicle_shader_node(material: bpy.types.Material) -> bpy.types.Node | N
     return None if not nt else nt.nodes.get(VEHICLE_SHADER_GROUP_NAME)
 
 
-def sync_param(material: bpy.types.Material, param: str, direction: SyncDirection) -> None:
+def sync_param(material: bpy.types.Material, param: str, direction: SyncDirection) -> bool:
+    """Sync one parameter, skipping the write when both sides already match. Returns True if a value was written."""
     i3d_params = material.i3d_attributes.shader_material_params
     vehicle_shader_node = _get_vehicle_shader_node(material)
     info = ATTR_MAP.get(param)
     if not info or vehicle_shader_node is None:
-        return
+        return False
     prop_key, socket_name = info
     if prop_key not in i3d_params:
-        return
+        return False
 
     socket = vehicle_shader_node.inputs.get(socket_name)
     if socket is None:
-        return
+        return False
+
+    if prop_key == "colorScale":
+        props_value = tuple(i3d_params[prop_key][0:3])
+        nodes_value = tuple(socket.default_value[0:3])
+    else:
+        props_value = i3d_params[prop_key][0]
+        nodes_value = socket.default_value
+    if values_equal(nodes_value, props_value):
+        return False
 
     if prop_key == "colorScale":
         if direction == SyncDirection.PROPS_TO_NODES:
-            socket.default_value = i3d_params[prop_key][0:3] + (1.0,)
+            socket.default_value = props_value + (1.0,)
         else:
-            material.i3d_attributes.shader_material_params[prop_key] = socket.default_value[0:3]
-        return
-
-    if direction == SyncDirection.PROPS_TO_NODES:
-        socket.default_value = i3d_params[prop_key][0]
+            material.i3d_attributes.shader_material_params[prop_key] = nodes_value
+    elif direction == SyncDirection.PROPS_TO_NODES:
+        socket.default_value = props_value
     else:
-        i3d_params[prop_key][0] = socket.default_value
+        i3d_params[prop_key][0] = nodes_value
+    count("rna writes")
+    return True
 
 
 def sync_params(
@@ -126,26 +271,29 @@ def sync_params(
     *,
     skip_color_scale: bool = False,
     only_color_scale: bool = False,
-) -> None:
+) -> set[str]:
+    """Sync the ATTR_MAP parameters. Returns the names of the parameters that were written."""
     if only_color_scale:
-        sync_param(material, "colorScale", direction)
-        return
-    for param in ATTR_MAP.keys():
-        if skip_color_scale and param == "colorScale":
-            continue
-        sync_param(material, param, direction)
+        params = ["colorScale"]
+    else:
+        params = [param for param in ATTR_MAP if not (skip_color_scale and param == "colorScale")]
+    return {param for param in params if sync_param(material, param, direction)}
 
 
-def sync_textures(material: bpy.types.Material, direction: SyncDirection) -> None:
+def sync_textures(material: bpy.types.Material, direction: SyncDirection, index: TreeIndex | None = None) -> set[str]:
     """
     Texture sync based on SPECS:
       - PROPS_TO_NODES: copy slot -> node.image (apply colorspace)
       - NODES_TO_PROPS: copy node.image path -> slot.source (as $data when possible)
-    Only NodeSpecs with `image` and TexImage nodes are considered.
+    Only NodeSpecs with `image` and TexImage nodes are considered, and only differing values are written.
+    Returns the roles of the texture nodes (PROPS_TO_NODES) or slots (NODES_TO_PROPS) that changed.
+    Pass the index of the build that just ran to skip scanning the tree again.
     """
+    changed: set[str] = set()
     nt = getattr(material, "node_tree", None)
     if not nt:
-        return
+        return changed
+    index = index or TreeIndex(nt)
 
     slots = material.i3d_attributes.shader_material_textures
 
@@ -153,7 +301,7 @@ def sync_textures(material: bpy.types.Material, direction: SyncDirection) -> Non
         img_spec = spec.image
         if not img_spec:
             continue
-        node = nt.nodes.get(role)
+        node = index.get(role)
         if not node or node.bl_idname != "ShaderNodeTexImage":
             continue
 
@@ -162,7 +310,8 @@ def sync_textures(material: bpy.types.Material, direction: SyncDirection) -> Non
             # default-only image role, only applies PROPS_TO_NODES
             if direction == SyncDirection.PROPS_TO_NODES and img_spec.default and getattr(node, "image", None) is None:
                 img = load_custom_image(img_spec.default)
-                set_image(img, node, img_spec.colorspace)
+                if set_image(img, node, img_spec.colorspace):
+                    changed.add(role)
             continue
 
         # Slot exists by RNA contract
@@ -173,13 +322,44 @@ def sync_textures(material: bpy.types.Material, direction: SyncDirection) -> Non
             if not src:
                 continue
             img = load_custom_image(src)
-            set_image(img, node, img_spec.colorspace)
+            if set_image(img, node, img_spec.colorspace):
+                changed.add(role)
 
         else:  # NODES_TO_PROPS
-            path = node.image.filepath if getattr(node, "image", None) else ""
-            if not path:
-                slot.source = ""
-                continue
-            data_path = get_data_path_from_file(path) or path
-            # avoid re-storing same-as-default
-            slot.source = "" if is_same_asset(data_path, slot.default_source) else data_path
+            path = source_filepath(node.image) if getattr(node, "image", None) else ""
+            if path:
+                data_path = get_data_path_from_file(path) or path
+                # avoid re-storing same-as-default
+                source = "" if is_same_asset(data_path, slot.default_source) else data_path
+            else:
+                source = ""
+            if slot.source != source:
+                slot.source = source
+                count("rna writes")
+                changed.add(role)
+    return changed
+
+
+@bpy.app.handlers.persistent
+def _clear_image_cache_on_file_change(*_args) -> None:
+    clear_image_cache()
+
+
+_CACHE_HANDLERS = (
+    bpy.app.handlers.load_post,
+    bpy.app.handlers.undo_post,
+    bpy.app.handlers.redo_post,
+)
+
+
+def register():
+    for handlers in _CACHE_HANDLERS:
+        if _clear_image_cache_on_file_change not in handlers:
+            handlers.append(_clear_image_cache_on_file_change)
+
+
+def unregister():
+    for handlers in _CACHE_HANDLERS:
+        if _clear_image_cache_on_file_change in handlers:
+            handlers.remove(_clear_image_cache_on_file_change)
+    clear_image_cache()
@@ -1,5 +1,7 @@
 import bpy
 
+from .report import last_profile
+
 
 class I3D_PT_MaterialVisualizer(bpy.types.Panel):
     bl_label = "I3D Material Visualizer"
@@ -21,12 +23,53 @@ class I3D_PT_MaterialVisualizer(bpy.types.Panel):
 
         layout.prop(scene_props, "src_material")
         layout.prop(scene_props, "dst_material")
-        layout.operator("i3d_material_visualizer.copy_attributes")
+        layout.operator("i3d_material_visualizer.copy_attributes").targets = "DESTINATION"
+        layout.prop(scene_props, "dst_collection")
+        row = layout.row(align=True)
+        row.operator("i3d_material_visualizer.copy_attributes", text="Copy to Selected").targets = "SELECTED"
+        row.operator("i3d_material_visualizer.copy_attributes", text="Copy to Collection").targets = "COLLECTION"
         layout.separator(type="LINE")
-        layout.operator("i3d_material_visualizer.standardize_uvs")
+        row = layout.row(align=True)
+        row.operator("i3d_material_visualizer.standardize_uvs").dry_run = False
+        row.operator("i3d_material_visualizer.standardize_uvs", text="", icon="VIEWZOOM").dry_run = True
+        layout.prop(scene_props, "use_global_masks")
+        row = layout.row()
+        row.active = not scene_props.use_global_masks
+        row.prop(scene_props, "use_specialized_shaders")
+        row = layout.row(align=True)
+        row.operator("i3d_material_visualizer.find_duplicates", text="Find Duplicates").merge = False
+        row.operator("i3d_material_visualizer.find_duplicates", text="Merge Duplicates").merge = True
+        layout.prop(scene_props, "deduplicate_builds")
+        layout.prop(scene_props, "minimal_graphs")
+        layout.operator("i3d_material_visualizer.sync_materials")
         row = layout.row(align=True)
         row.operator("i3d_material_visualizer.visualize_all", text="Visualize All Materials").enable = True
-        row.operator("i3d_material_visualizer.visualize_all", text="Disable All Materials").enable = False
+        op = row.operator("i3d_material_visualizer.visualize_all", text="Disable All Materials")
+        op.enable, op.purge = False, False
+        op = row.operator("i3d_material_visualizer.visualize_all", text="", icon="TRASH")
+        op.enable, op.purge = False, True
+        layout.prop(scene_props, "purge_on_disable")
+
+        row = layout.row(heading="Texture Proxies")
+        row.prop(scene_props, "use_texture_proxies", text="")
+        sub = row.row()
+        sub.active = scene_props.use_texture_proxies
+        sub.prop(scene_props, "proxy_size", text="")
+
+        layout.prop(scene_props, "profile")
+        if scene_props.profile and (profile := last_profile()):
+            box = layout.box()
+            box.label(text=f"Last run: {profile['label']}")
+            col = box.column(align=True)
+            for name, seconds in (*profile["timings"].items(), *profile["material_timings"].items()):
+                col.label(text=f"{name}: {seconds * 1000:.1f} ms")
+            for name, n in profile["counters"].items():
+                col.label(text=f"{name}: {n}")
+            if rows := profile["materials"][:5]:
+                col.separator()
+                col.label(text="Slowest materials:")
+                for row in rows:
+                    col.label(text=f"{row['material']}: {row['total'] * 1000:.1f} ms")
 
 
 classes = (I3D_PT_MaterialVisualizer,)
@@ -1,30 +1,81 @@
 from collections import defaultdict
-from pathlib import Path
+from dataclasses import dataclass
 
 import bpy
 
-from .constants import VEHICLE_SHADER_GROUP_NAME
 
+def is_vehicle_shader(material: bpy.types.Material) -> bool:
+    """Check if the material is using the vehicleShader."""
+    return material.i3d_attributes.shader_name == "vehicleShader"
 
-def import_shader() -> None:
-    """Import the vehicleShader node group from the bundled shader.blend file if missing."""
-    if VEHICLE_SHADER_GROUP_NAME in bpy.data.node_groups:
-        return  # already imported
-    library = Path(__file__).parent / "shader.blend"
 
-    try:
-        with bpy.data.libraries.load(str(library), link=False) as (data_from, data_to):
-            data_to.node_groups = [VEHICLE_SHADER_GROUP_NAME]
-    except Exception as e:
-        print(f"Failed to import shader from {library}: {e}")
+class MaterialUserIndex:
+    """Reverse index of a scene: material -> mesh user objects, and mesh -> UV layer names by index."""
 
+    def __init__(self, scene: bpy.types.Scene):
+        users: dict[bpy.types.Material, list[bpy.types.Object]] = defaultdict(list)
+        self.uv_names: dict[bpy.types.Mesh, tuple[str, ...]] = {}
+        for obj in scene.objects:
+            if obj.type != "MESH":
+                continue
+            for mat in {slot.material for slot in obj.material_slots if slot.material}:
+                users[mat].append(obj)
+            if obj.data not in self.uv_names:
+                self.uv_names[obj.data] = tuple(layer.name for layer in obj.data.uv_layers)
+        self.material_users = dict(users)
+
+    def users(self, mat: bpy.types.Material) -> list[bpy.types.Object]:
+        return self.material_users.get(mat, [])
+
+    def uv_name(self, mesh: bpy.types.Mesh, uv_index: int) -> str | None:
+        names = self.uv_names.get(mesh, ())
+        return names[uv_index] if len(names) > uv_index else None
+
+
+_user_indices: dict[int, MaterialUserIndex] = {}
+
+
+def get_material_user_index(scene: bpy.types.Scene | None = None) -> MaterialUserIndex:
+    """Return the cached reverse index for the scene, building it on first use after an invalidation."""
+    scene = scene or bpy.context.scene
+    key = scene.as_pointer()
+    if key not in _user_indices:
+        _user_indices[key] = MaterialUserIndex(scene)
+    return _user_indices[key]
+
+
+def invalidate_material_user_index() -> None:
+    _user_indices.clear()
+
+
+@bpy.app.handlers.persistent
+def _invalidate_on_depsgraph_update(scene, depsgraph) -> None:
+    if not _user_indices:
+        return
+    for update in depsgraph.updates:
+        if isinstance(update.id, (bpy.types.Mesh, bpy.types.Collection)) or (
+            isinstance(update.id, bpy.types.Object) and update.is_updated_geometry
+        ):
+            invalidate_material_user_index()
+            return
 
-def is_vehicle_shader(material: bpy.types.Material) -> bool:
-    """Check if the material is using the vehicleShader."""
-    return material.i3d_attributes.shader_name == "vehicleShader"
 
+@bpy.app.handlers.persistent
+def _invalidate_on_file_change(*_args) -> None:
+    invalidate_material_user_index()
 
-def get_uv_names_by_index(mat: bpy.types.Material) -> tuple[dict[int, set[str]], list[bpy.types.Object]]:
+
+_INVALIDATING_HANDLERS = (
+    (bpy.app.handlers.depsgraph_update_post, _invalidate_on_depsgraph_update),
+    (bpy.app.handlers.load_post, _invalidate_on_file_change),
+    (bpy.app.handlers.undo_post, _invalidate_on_file_change),
+    (bpy.app.handlers.redo_post, _invalidate_on_file_change),
+)
+
+
+def get_uv_names_by_index(
+    mat: bpy.types.Material, index: MaterialUserIndex | None = None
+) -> tuple[dict[int, set[str]], list[bpy.types.Object]]:
     """
     Gathers all UV map names for a material's required UV indices across all its user objects.
 
@@ -39,24 +90,77 @@ def get_uv_names_by_index(mat: bpy.types.Material) -> tuple[dict[int, set[str]],
     if not required_indices:
         return {}, []
 
-    user_objects = [
-        obj
-        for obj in bpy.context.scene.objects
-        if obj.type == "MESH" and any(slot.material == mat for slot in obj.material_slots if slot.material)
-    ]
+    index = index or get_material_user_index()
+    user_objects = index.users(mat)
     if not user_objects:
         return {}, []
 
     all_names = defaultdict(set)
     for obj in user_objects:
         for uv_index in required_indices:
-            if len(obj.data.uv_layers) > uv_index:
-                all_names[uv_index].add(obj.data.uv_layers[uv_index].name)
+            if (name := index.uv_name(obj.data, uv_index)) is not None:
+                all_names[uv_index].add(name)
     return dict(all_names), user_objects
 
 
-def find_uv_inconsistencies(mat: bpy.types.Material) -> dict[int, set[str]]:
+def find_uv_inconsistencies(mat: bpy.types.Material, index: MaterialUserIndex | None = None) -> dict[int, set[str]]:
     """Find UV map name inconsistencies for the given material."""
-    all_names, _ = get_uv_names_by_index(mat)
+    all_names, _ = get_uv_names_by_index(mat, index)
     # Filter out indices that have no inconsistencies
     return {index: names for index, names in all_names.items() if len(names) > 1}
+
+
+@dataclass(frozen=True)
+class UVRename:
+    mesh: bpy.types.Mesh
+    uv_index: int
+    old_name: str
+    new_name: str
+
+
+def plan_uv_standardization(
+    materials: list[bpy.types.Material], index: MaterialUserIndex
+) -> tuple[list[UVRename], list[UVRename]]:
+    """
+    Compute the UV layer renames that make each required UV index use one name across the scene.
+    Every mesh datablock is visited once, however many objects instance it. Returns the renames and the
+    conflicts: renames skipped because the mesh already has another layer with the target name.
+    """
+    inconsistent: dict[int, set[str]] = defaultdict(set)
+    for mat in materials:
+        for uv_index, names in find_uv_inconsistencies(mat, index).items():
+            inconsistent[uv_index].update(names)
+    master_names = {uv_index: sorted(names)[0] for uv_index, names in inconsistent.items()}
+
+    renames, conflicts = [], []
+    for mesh, names in index.uv_names.items():
+        for uv_index, bad_names in inconsistent.items():
+            if len(names) <= uv_index or names[uv_index] not in bad_names:
+                continue
+            if (master := master_names[uv_index]) == names[uv_index]:
+                continue
+            rename = UVRename(mesh, uv_index, names[uv_index], master)
+            (conflicts if master in names else renames).append(rename)
+    return renames, conflicts
+
+
+def apply_uv_renames(renames: list[UVRename]) -> set[bpy.types.Mesh]:
+    """Apply a rename plan and drop the stale users index. Returns the meshes that changed."""
+    for rename in renames:
+        rename.mesh.uv_layers[rename.uv_index].name = rename.new_name
+    if renames:
+        invalidate_material_user_index()
+    return {rename.mesh for rename in renames}
+
+
+def register():
+    for handlers, handler in _INVALIDATING_HANDLERS:
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister():
+    for handlers, handler in _INVALIDATING_HANDLERS:
+        if handler in handlers:
+            handlers.remove(handler)
+    invalidate_material_user_index()